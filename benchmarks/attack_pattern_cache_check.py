@@ -0,0 +1,97 @@
+"""Attack pattern cache check: loads the DISARM attack patterns through the cache against the stub helper
+
+Each step loads the map with a new stub helper, as a run of the connector does, and checks which
+queries reached the platform: none for a hit within the TTL, only the freshness query once the TTL
+expired and the framework did not change, the full listing when it changed, and when the cache
+file is missing, corrupt, incomplete or of another version. Run from the repository root:
+
+    python benchmarks/attack_pattern_cache_check.py
+"""
+import json
+import os
+import sys
+import tempfile
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, "..", "src"))
+sys.path.insert(0, BENCHMARKS)
+
+import stub_helper  # noqa: E402
+import synthetic  # noqa: E402
+from lib.attack_pattern_cache import AttackPatternCache  # noqa: E402
+
+TTL = 3600
+
+
+def load(cache, change=None) -> tuple:
+    """Loads the map with a new stub helper (changed by `change` first), returns it with the queries made"""
+    helper = stub_helper.StubHelper()
+    if change is not None:
+        change(helper.api.attack_pattern.patterns)
+    ids = cache.load(helper)
+    queries = helper.api.attack_pattern
+    return ids, {"freshness": queries.page_queries, "listings": queries.listings}
+
+
+def expire(cache) -> None:
+    """Moves the fetch time of the cache file back past the TTL"""
+    with open(cache.path, encoding="utf-8") as f:
+        content = json.load(f)
+    content["fetched_at"] -= TTL + 1
+    with open(cache.path, "w", encoding="utf-8") as f:
+        json.dump(content, f)
+
+
+def corrupt(content):
+    """Returns a function writing `content` (text) as the cache file"""
+    def write(cache):
+        with open(cache.path, "w", encoding="utf-8") as f:
+            f.write(content)
+    return write
+
+
+def add_pattern(patterns) -> None:
+    patterns.append(dict(patterns[0], x_mitre_id="T9999", standard_id="attack-pattern--00000000-0000-4000-8000-000000009999"))
+
+
+def update_pattern(patterns) -> None:
+    patterns[0]["updated_at"] = "2025-01-01T00:00:00.000Z"
+
+
+def main():
+    codes = synthetic.technique_codes()
+    stub_helper.install(sorted(set(codes) | {code.split(".")[0] for code in codes}))
+
+    # Step name, what is done to the cache file before loading, change of the platform, expected queries
+    steps = [
+        ("cold", None, None, {"freshness": 1, "listings": 1}),
+        ("hit within the TTL", None, None, {"freshness": 0, "listings": 0}),
+        ("expired, unchanged", expire, None, {"freshness": 1, "listings": 0}),
+        ("hit after extending", None, None, {"freshness": 0, "listings": 0}),
+        ("expired, pattern added", expire, add_pattern, {"freshness": 1, "listings": 1}),
+        ("expired, pattern updated", expire, update_pattern, {"freshness": 1, "listings": 1}),
+        ("truncated file", corrupt('{"version": 1, "fetched_at": '), None, {"freshness": 1, "listings": 1}),
+        ("empty object", corrupt("{}"), None, {"freshness": 1, "listings": 1}),
+        ("not an object", corrupt("[]"), None, {"freshness": 1, "listings": 1}),
+        ("older format", corrupt('{"fetched_at": 0, "ids": {}}'), None, {"freshness": 1, "listings": 1}),
+        ("wrong types", corrupt('{"version": 1, "fetched_at": "now", "fingerprint": null, "ids": []}'), None, {"freshness": 1, "listings": 1}),
+        ("hit after recovery", None, None, {"freshness": 0, "listings": 0}),
+    ]
+    ok = True
+    with tempfile.TemporaryDirectory() as workdir:
+        cache = AttackPatternCache(os.path.join(workdir, "disarm_attack_patterns.json"), TTL)
+        for name, prepare, change, expected in steps:
+            if prepare is not None:
+                prepare(cache)
+            try:
+                ids, queries = load(cache, change)
+                same = queries == expected and len(ids) >= len(codes) and (change is not add_pattern or "T9999" in ids)
+            except Exception as e:
+                queries, same = repr(e), False
+            ok = ok and same
+            print(f"{name}: {queries} (expected {expected}): {'ok' if same else 'DIFFERENT'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Loader benchmark: row-by-row iteration vs the column-schema-driven loader, with and without the dataset cache
+
+Also reports the memory per incident of the `IncidentTable` returned by the loader and of the same
+incidents as a list of dicts.
+
+Run from the repository root:
+
+    python benchmarks/bench_loader.py --rows 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from lib.dataset_cache import DatasetCache  # noqa: E402
+from lib.margot_dataset_importer import _parse_csv, incidents_from_parsed, load_data  # noqa: E402
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "datasets", "merged_Foulde_DSRM_additions.csv")
+
+
+def load_data_rowwise(csv_path, numeric_flags=False):
+    """Reference implementation: the loader as it was before the column schema (df.iterrows)
+
+    With `numeric_flags`, the flag columns are first converted to numbers, as the loader does, so
+    that a flag column pandas read as text (i. e., because of a '`1' cell) gives the same flags.
+    Only used to compare the records, the timed run is the original code.
+    """
+    df = pd.read_csv(csv_path)
+    if numeric_flags:
+        for column in df.columns[8:df.columns.get_loc('Source 1')]:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    incidents = []
+    for index, row in df.iterrows():
+        techniques = []
+        for column in df.columns[8:df.columns.get_loc('Facebook')]:
+            if row[column] == 1:
+                techniques.append(column.split('_')[0])
+        channels = []
+        for column in df.columns[df.columns.get_loc('Facebook'):df.columns.get_loc('Source 1')]:
+            if row[column] == 1:
+                channels.append(column)
+        sources = []
+        for column in df.columns[df.columns.get_loc('Source 1'):df.columns.get_loc('Source 8')]:
+            if not pd.isna(row[column]):
+                sources.append(row[column])
+        incidents.append({
+            'year': row['Year'],
+            'target_country': row['Target Country'],
+            'event': row['Event'],
+            'region': row['Region'],
+            'sub_region': row['Sub-region'],
+            'country_of_origin': row['Country of Origin'],
+            'threat_actor': row['Threat Actor'],
+            'event_description': row['Event description'],
+            'techniques': techniques,
+            'channels': channels,
+            'sources': sources
+        })
+    return incidents
+
+
+def synthetic_csv(path, rows, seed=0):
+    """Write a Fulde-format CSV of `rows` incidents resampled from the bundled dataset"""
+    template = pd.read_csv(DATASET)
+    rng = np.random.default_rng(seed)
+    df = template.iloc[rng.integers(0, len(template), rows)].reset_index(drop=True)
+    df["Event"] = df["Event"].astype(str) + " #" + df.index.astype(str)
+    df.to_csv(path, index=False)
+
+
+def allocated(function, *args):
+    """Returns the result of the function and the memory it allocated that is still alive"""
+    tracemalloc.start()
+    result = function(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.csv")
+        synthetic_csv(path, args.rows)
+
+        vectorized, vectorized_time = timed(load_data, path)
+        _, rowwise_time = timed(load_data_rowwise, path)
+        rowwise = load_data_rowwise(path, numeric_flags=True)
+
+        cache = DatasetCache(os.path.join(tmp, "cache"))
+        _, cold_time = timed(load_data, path, cache)
+        cached, cached_time = timed(load_data, path, cache)
+        _, parse_time = timed(lambda: pd.read_csv(path))
+        _, mapped_time = timed(cache.get, path, None)
+
+        parsed = _parse_csv(path)
+        table, table_bytes = allocated(incidents_from_parsed, parsed)
+        _, dict_bytes = allocated(lambda: [dict(record) for record in table])
+
+    # NaN cells never compare equal, so compare the string representation of the records
+    same = [repr(x) for x in vectorized] == [repr(x) for x in rowwise] == [repr(x) for x in cached]
+    print(f"rows: {args.rows}")
+    print(f"row-by-row: {rowwise_time:.2f}s")
+    print(f"vectorized: {vectorized_time:.2f}s ({rowwise_time / vectorized_time:.1f}x)")
+    print(f"cache miss (parse + store): {cold_time:.2f}s")
+    print(f"cache hit: {cached_time:.2f}s ({vectorized_time / cached_time:.1f}x vs parsing)")
+    print(f"CSV parse only: {parse_time:.2f}s, cached columns only: {mapped_time:.3f}s")
+    print(f"memory per incident: {table_bytes / args.rows:.0f} bytes as a table, "
+          f"{dict_bytes / args.rows:.0f} bytes as dicts ({dict_bytes / table_bytes:.1f}x)")
+    print(f"same records: {same}")
+
+
+if __name__ == "__main__":
+    main()
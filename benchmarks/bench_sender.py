@@ -0,0 +1,118 @@
+"""Sender benchmark: a connector run against a slow and failing stub platform, with 0 to N sender threads
+
+The stub helper of `stub_helper.py` waits `--latency` seconds in each `send_stix2_bundle` and fails
+every `--fail-every` calls, the failed bundles being retried by the sender. With no sender thread,
+generation and sending take turns; with sender threads, the bundles are sent while the next ones are
+generated. Each scenario runs in a fresh process on the same synthetic Fulde CSV, and reports its
+time, the time spent in the `send` calls, the time the generation waited for the senders and the
+latency of the bundles. Run from the repository root:
+
+    python benchmarks/bench_sender.py --incidents 20000 --workers 0 1 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(BENCHMARKS, "..", "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, BENCHMARKS)
+
+import stub_helper  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def run(args, workers, workdir) -> dict:
+    """Runs the connector once with `workers` sender threads, returns its figures"""
+    codes = synthetic.technique_codes()
+    stub_helper.install(
+        sorted(set(codes) | {code.split(".")[0] for code in codes}), args.latency, fail_every=args.fail_every
+    )
+    sources_path = os.path.join(workdir, "sources.json")
+    os.environ.update({
+        "CONNECTOR_RUN_EVERY": "1d",
+        "CONNECTOR_SOURCES": sources_path,
+        "CONNECTOR_CACHE_DIR": os.path.join(workdir, f"cache-{workers}"),
+        "CONNECTOR_BUNDLE_MAX_OBJECTS": str(args.bundle_objects),
+        "CONNECTOR_SEND_WORKERS": str(workers),
+        "CONNECTOR_SEND_QUEUE_SIZE": str(args.queue_size),
+        "CONNECTOR_SEND_RETRY_BACKOFF": str(args.backoff),
+    })
+    os.chdir(SRC)
+    from main import CustomConnector
+
+    connector = CustomConnector()
+    start = time.perf_counter()
+    try:
+        connector.run()
+    except SystemExit:
+        pass
+    seconds = time.perf_counter() - start
+    summary = connector.metrics.summary()
+    helper = connector.helper
+    return {
+        "seconds": seconds,
+        "send": summary["stages"].get("send", 0.0),
+        "send_wait": summary["stages"].get("send_wait", 0.0),
+        "bundles": helper.bundles,
+        "objects": helper.objects,
+        "failures": helper.failures,
+        **summary["send"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--incidents", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 4])
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per send_stix2_bundle call")
+    parser.add_argument("--fail-every", type=int, default=10, help="every how many sends fail (0 for never)")
+    parser.add_argument("--backoff", type=float, default=0.05, help="seconds before the first retry")
+    parser.add_argument("--bundle-objects", type=int, default=1000)
+    parser.add_argument("--queue-size", type=int, default=4)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run(args, args.child, args.workdir)))
+        return
+
+    report = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        fulde_path = os.path.join(workdir, "fulde.csv")
+        synthetic.generate_fulde_csv(fulde_path, args.incidents)
+        with open(os.path.join(workdir, "sources.json"), "w") as f:
+            json.dump([{"name": "fulde", "format": "fulde-csv", "path": fulde_path}], f)
+
+        print(f"{'workers':>7}{'seconds':>9}{'send':>9}{'waited':>9}{'bundles':>9}{'objects':>9}"
+              f"{'retries':>9}{'p50':>8}{'p95':>8}{'queue':>7}")
+        for workers in args.workers:
+            options = [
+                "--latency", str(args.latency), "--fail-every", str(args.fail_every), "--backoff", str(args.backoff),
+                "--bundle-objects", str(args.bundle_objects), "--queue-size", str(args.queue_size),
+            ]
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", str(workers), "--workdir", workdir, *options],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = report[workers] = json.loads(output.splitlines()[-1])
+            print(
+                f"{workers:>7}{result['seconds']:>9.2f}{result['send']:>9.2f}{result['send_wait']:>9.2f}"
+                f"{result['bundles']:>9}{result['objects']:>9}{result.get('retries', 0):>9}"
+                f"{result.get('latency_p50', 0):>8.3f}{result.get('latency_p95', 0):>8.3f}"
+                f"{result.get('max_queue_depth', 0):>7}"
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
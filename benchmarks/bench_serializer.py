@@ -0,0 +1,77 @@
+"""Bundle serialization benchmark: stix2.Bundle(...).serialize() vs the bundle serializers
+
+Run from the repository root:
+
+    python benchmarks/bench_serializer.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+import stix2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from lib.bundle_serializer import JsonBundleSerializer, OrjsonBundleSerializer, orjson  # noqa: E402
+from lib.stix_graph import StixGraphBuilder  # noqa: E402
+
+NAMESPACE = uuid.UUID("12345678-1234-5678-1234-567812345678")
+
+
+def build_objects(count, validate):
+    """Builds `count` objects shaped as a run: one intrusion set per incident, its actor, country and relationships"""
+    graph = StixGraphBuilder(NAMESPACE, validate)
+    objects = []
+    incident = 0
+    while len(objects) < count:
+        intrusion_set = graph.intrusion_set(f"incident {incident}", f"Incident {incident}", "Description", ["incident"])
+        actor = graph.threat_actor(graph.normalizer.actor(f"Actor {incident % 50}"))
+        country = graph.location(graph.normalizer.country(f"Country {incident % 80}"))
+        objects.extend([
+            intrusion_set,
+            actor,
+            country,
+            graph.relationship(intrusion_set["id"], "attributed-to", actor["id"]),
+            graph.relationship(intrusion_set["id"], "targets", country["id"]),
+        ])
+        incident += 1
+    return objects[:count]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--max-stix2", type=int, default=100000,
+                        help="largest size measured with stix2.Bundle (it needs stix2 objects, which are slow to build)")
+    args = parser.parse_args()
+
+    serializers = [JsonBundleSerializer()] + ([OrjsonBundleSerializer()] if orjson is not None else [])
+    for size in args.sizes:
+        print(f"{size} objects")
+        if size <= args.max_stix2:
+            stix2_objects = build_objects(size, validate=True)
+            bundle, elapsed = timed(lambda: stix2.Bundle(objects=stix2_objects, allow_custom=True).serialize())
+            print(f"  stix2.Bundle.serialize: {elapsed:.2f}s ({len(bundle) / 1e6:.1f} MB)")
+            del stix2_objects, bundle
+
+        objects = build_objects(size, validate=False)
+        outputs = []
+        for serializer in serializers:
+            bundle, elapsed = timed(serializer.serialize, objects)
+            print(f"  {serializer.name}: {elapsed:.2f}s ({len(bundle) / 1e6:.1f} MB)")
+            outputs.append(bundle)
+        # Deterministic: same objects in another order give the same bytes, whatever the serializer
+        shuffled = serializers[-1].serialize(list(reversed(objects)))
+        print(f"  byte-identical: {len(set(outputs + [shuffled])) == 1}")
+
+
+if __name__ == "__main__":
+    main()
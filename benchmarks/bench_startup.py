@@ -0,0 +1,94 @@
+"""Startup benchmark: import time of the connector, and of `start.py` when no run is due
+
+Each scenario runs in a fresh interpreter with `-X importtime`, reporting the wall time of the
+process, the time spent importing modules and which of the heavy stacks (pandas, numpy, stix2) got
+imported. The OpenCTI helper is the stub of `stub_helper.py`. Run from the repository root:
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(BENCHMARKS, "..", "src")
+
+HEAVY_MODULES = ["pandas", "numpy", "stix2"]
+
+STUB = f"import sys; sys.path.insert(0, {BENCHMARKS!r}); import stub_helper; stub_helper.install([]); "
+
+SCENARIOS = {
+    # The connector modules, the dataframe stack being only imported by the load stage
+    "import main": STUB + "import main",
+    # What the connector imported at startup before the dataframe stack was deferred
+    "import main (eager)": STUB + "import main, lib.dataset_cache, lib.disarm_workbook, lib.margot_dataset_importer, "
+                                  "datasets.disarm_incidents_to_foulde",
+    # The entry point of a run-and-terminate connector whose last run is recent
+    "start.py, no run due": None,
+}
+
+
+def import_times(stderr) -> dict:
+    """Returns the cumulative import time (seconds) of each top-level import of an -X importtime output"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def run(scenario, workdir) -> tuple:
+    """Runs a scenario once, returns (wall seconds, import seconds, heavy modules imported)"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    if SCENARIOS[scenario] is None:
+        env.update({
+            "CONNECTOR_RUN_AND_TERMINATE": "true",
+            "CONNECTOR_RUN_EVERY": "1d",
+            "CONNECTOR_CACHE_DIR": workdir,
+        })
+        command = [sys.executable, "-X", "importtime", "start.py"]
+    else:
+        command = [sys.executable, "-X", "importtime", "-c", SCENARIOS[scenario]]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=SRC, env=env, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    imports = import_times(result.stderr)
+    loaded = {line.split("|")[-1].strip() for line in result.stderr.splitlines() if line.startswith("import time:")}
+    return wall, sum(imports.values()), [module for module in HEAVY_MODULES if module in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # A run that succeeded just now, so that start.py finds nothing due
+        with open(os.path.join(workdir, "run_marker.json"), "w") as f:
+            json.dump({"last_run": int(time.time()), "pending": False, "files": {}}, f)
+
+        print(f"{'scenario':<24}{'wall':>9}{'imports':>10}  heavy modules imported")
+        for scenario in SCENARIOS:
+            runs = [run(scenario, workdir) for _ in range(args.repeat)]
+            wall = statistics.median(r[0] for r in runs)
+            imports = statistics.median(r[1] for r in runs)
+            report[scenario] = {"wall_seconds": wall, "import_seconds": imports, "heavy_modules": runs[0][2]}
+            print(f"{scenario:<24}{wall:>8.3f}s{imports:>9.3f}s  {', '.join(runs[0][2]) or '-'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
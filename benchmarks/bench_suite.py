@@ -0,0 +1,160 @@
+"""Connector benchmark suite: load, resolve, generate, serialize and send synthetic datasets offline
+
+Each size runs in its own process on a synthetic Fulde CSV of that many incidents and a DISARM
+workbook of up to `--disarm-max` incidents (an xlsx sheet cannot hold the techniques of much more),
+against the stub helper of `stub_helper.py`. Every scenario reports its time, its throughput and the
+peak RSS of the process so far. Run from the repository root:
+
+    python benchmarks/bench_suite.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, "..", "src"))
+sys.path.insert(0, BENCHMARKS)
+
+import stub_helper  # noqa: E402
+import synthetic  # noqa: E402
+
+NAMESPACE = uuid.UUID("12345678-1234-5678-1234-567812345678")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def attack_pattern_codes() -> list:
+    """The DISARM codes of the datasets and their parent techniques, as in the DISARM framework"""
+    codes = synthetic.technique_codes()
+    return sorted(set(codes) | {code.split(".")[0] for code in codes})
+
+
+def run_size(size, disarm_max, workers, workdir) -> list:
+    """Runs the scenarios of a size, returns a list of (scenario, seconds, items, unit, peak RSS)"""
+    stub_helper.install(attack_pattern_codes())
+
+    from lib.bundle_chunker import BundleChunker
+    from lib.bundle_serializer import get_serializer
+    from lib.scheduler import GenerationScheduler
+    from lib.sources import load_disarm_rows, load_fulde_rows
+    from lib.stix_graph import StixGraphBuilder
+    from lib.technique_resolver import TechniqueResolver
+
+    results = []
+
+    def record(name, start, items, unit):
+        results.append((name, time.perf_counter() - start, items, unit, peak_rss_mb()))
+
+    fulde_path = os.path.join(workdir, "fulde.csv")
+    disarm_path = os.path.join(workdir, "disarm.xlsx")
+    disarm_size = min(size, disarm_max)
+    start = time.perf_counter()
+    synthetic.generate_fulde_csv(fulde_path, size)
+    synthetic.generate_disarm_workbook(disarm_path, disarm_size)
+    record("synthetic data", start, size + disarm_size, "incidents")
+
+    start = time.perf_counter()
+    fulde_rows = load_fulde_rows(fulde_path)
+    disarm_rows = load_disarm_rows(disarm_path)
+    record("load", start, len(fulde_rows) + len(disarm_rows), "incidents")
+
+    helper = stub_helper.StubHelper()
+    resolver = TechniqueResolver.from_attack_patterns(helper.api.attack_pattern.list())
+    codes = [code for row in fulde_rows for code in row["techniques"]]
+    codes += [code for row in disarm_rows for code in row["technique_ids"]]
+    start = time.perf_counter()
+    for code in codes:
+        resolver.resolve(code)
+    record("resolve", start, len(codes), "lookups")
+    # A fresh resolver for the generation, as the connector builds one per run
+    resolver = TechniqueResolver(resolver.ids)
+
+    graph = StixGraphBuilder(NAMESPACE)
+    stats = {"generate_seconds": 0.0, "objects": 0}
+    jobs = [("disarm", [disarm_rows], dict(stats)), ("margotfulde", [fulde_rows], dict(stats))]
+    start = time.perf_counter()
+    groups = list(GenerationScheduler(workers).generate(jobs, resolver, graph))
+    objects = sum(len(group) for group in groups)
+    record("generate", start, objects, "objects")
+
+    serializer = get_serializer()
+    sizes = []
+    chunker = BundleChunker(lambda bundle: sizes.append(len(serializer.serialize(bundle))), 5000)
+    start = time.perf_counter()
+    for group in groups:
+        chunker.add(group)
+    chunker.flush()
+    record("serialize", start, chunker.objects, "objects")
+    del groups, fulde_rows, disarm_rows
+
+    # The whole connector run: state, sources, cache, generation, bundling and sending
+    sources_path = os.path.join(workdir, "sources.json")
+    with open(sources_path, "w") as f:
+        json.dump([
+            {"name": "disarm", "format": "disarm-xlsx", "path": disarm_path},
+            {"name": "fulde", "format": "fulde-csv", "path": fulde_path},
+        ], f)
+    os.environ.update({
+        "CONNECTOR_RUN_EVERY": "1d",
+        "CONNECTOR_SOURCES": sources_path,
+        "CONNECTOR_CACHE_DIR": os.path.join(workdir, "cache"),
+        "CONNECTOR_WORKERS": str(workers),
+    })
+    from main import CustomConnector
+
+    connector = CustomConnector()
+    start = time.perf_counter()
+    try:
+        connector.run()
+    except SystemExit:
+        pass
+    record("send (connector run)", start, connector.helper.objects, "objects")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--disarm-max", type=int, default=100000,
+                        help="largest DISARM workbook, in incidents")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        # A single size, in a fresh process so that the peak RSS is its own
+        with tempfile.TemporaryDirectory() as workdir:
+            results = run_size(args.child, args.disarm_max, args.workers, workdir)
+        print(json.dumps(results))
+        return
+
+    report = {}
+    print(f"{'size':>9}  {'scenario':<22}{'seconds':>9}  {'throughput':>24}  {'peak RSS':>10}")
+    for size in args.sizes:
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", str(size), "--disarm-max", str(args.disarm_max),
+             "--workers", str(args.workers)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        report[size] = json.loads(output.splitlines()[-1])
+        for name, seconds, items, unit, rss in report[size]:
+            throughput = f"{items / seconds:,.0f} {unit}/s" if seconds else "-"
+            print(f"{size:>9}  {name:<22}{seconds:>9.2f}  {throughput:>24}  {rss:>7.0f} MB")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Default sources check: runs the connector on its default sources against the stub helper
+
+Without `CONNECTOR_SOURCES` the connector imports the default registry of `lib/sources.py` from the
+`datasets` directory. Every incident (i. e., incident name, the rows of an event share its intrusion
+set) should give exactly one intrusion set: a registry with two sources of the same incidents gives
+two intrusion sets of the same name. Run from the repository root:
+
+    python benchmarks/default_sources_check.py
+"""
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(BENCHMARKS, "..", "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, BENCHMARKS)
+
+import stub_helper  # noqa: E402
+import synthetic  # noqa: E402
+
+# Field holding the name of an incident, for each generator kind
+INCIDENT_NAMES = {"margotfulde": "event", "disarm": "name"}
+
+
+class RecordingHelper(stub_helper.StubHelper):
+    """Stub helper keeping the names of the intrusion sets it receives"""
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.intrusion_sets = {}
+
+    def send_stix2_bundle(self, bundle, update=False, work_id=None, **kwargs):
+        for stix_object in json.loads(bundle)["objects"]:
+            if stix_object["type"] == "intrusion-set":
+                self.intrusion_sets[stix_object["id"]] = stix_object["name"]
+        return super().send_stix2_bundle(bundle, update, work_id, **kwargs)
+
+
+def main():
+    codes = synthetic.technique_codes()
+    stub_helper.install(sorted(set(codes) | {code.split(".")[0] for code in codes}))
+    import pycti
+
+    pycti.OpenCTIConnectorHelper = RecordingHelper
+    os.environ.pop("CONNECTOR_SOURCES", None)
+    os.environ.setdefault("CONNECTOR_RUN_EVERY", "1d")
+    os.chdir(SRC)
+
+    from lib.sources import SourceRegistry
+    from main import CustomConnector
+
+    incidents = set()
+    for source in SourceRegistry.from_file().enabled():
+        incidents.update(str(row[INCIDENT_NAMES[source.kind]]) for row in source.load())
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["CONNECTOR_CACHE_DIR"] = workdir
+        connector = CustomConnector()
+        try:
+            connector.run()
+        except SystemExit:
+            pass
+    intrusion_sets = connector.helper.intrusion_sets
+
+    repeated = sorted(name for name, count in Counter(intrusion_sets.values()).items() if count > 1)
+    same = not repeated and set(intrusion_sets.values()) == incidents
+    print(
+        f"default sources: {len(incidents)} incidents, {len(intrusion_sets)} intrusion sets, "
+        f"{len(repeated)} names with several intrusion sets{f' (e.g. {repeated[:3]})' if repeated else ''}: "
+        f"{'ok' if same else 'DIFFERENT'}"
+    )
+    sys.exit(0 if same else 1)
+
+
+if __name__ == "__main__":
+    main()
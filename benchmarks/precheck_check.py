@@ -0,0 +1,80 @@
+"""Precheck check: runs the connector twice against the stub helper, the second time with objects already in the platform
+
+The first run sends every object to an empty stub platform. Part of them (every `--every`th ID)
+are then put in the platform, which keeps them, as OpenCTI does, under a standard ID of its own
+with the ID sent by the connector in `x_opencti_stix_ids`. With `CONNECTOR_PRECHECK_EXISTING`,
+the second run should send exactly the other objects. Run from the repository root:
+
+    python benchmarks/precheck_check.py --every 2
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(BENCHMARKS, "..", "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, BENCHMARKS)
+
+import stub_helper  # noqa: E402
+import synthetic  # noqa: E402
+
+
+class RecordingHelper(stub_helper.StubHelper):
+    """Stub helper keeping the IDs of the objects it receives"""
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.received = []
+
+    def send_stix2_bundle(self, bundle, update=False, work_id=None, **kwargs):
+        self.received.extend(stix_object["id"] for stix_object in json.loads(bundle)["objects"])
+        return super().send_stix2_bundle(bundle, update, work_id, **kwargs)
+
+
+def run(workdir, name) -> list:
+    """Runs the connector once with its own state, returns the IDs it sent"""
+    os.environ["CONNECTOR_CACHE_DIR"] = os.path.join(workdir, name)
+    from main import CustomConnector
+
+    connector = CustomConnector()
+    try:
+        connector.run()
+    except SystemExit:
+        pass
+    return connector.helper.received
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--every", type=int, default=2, help="every how many objects of the first run are in the platform")
+    args = parser.parse_args()
+
+    codes = synthetic.technique_codes()
+    stub_helper.install(sorted(set(codes) | {code.split(".")[0] for code in codes}))
+    import pycti
+
+    pycti.OpenCTIConnectorHelper = RecordingHelper
+    os.environ.setdefault("CONNECTOR_RUN_EVERY", "1d")
+    os.environ.update({"CONNECTOR_PRECHECK_EXISTING": "true", "CONNECTOR_UPDATE_EXISTING_DATA": "false"})
+    os.chdir(SRC)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        first = run(workdir, "first")
+        existing = set(sorted(set(first))[::args.every])
+        RecordingHelper.existing.update(existing)
+        second = run(workdir, "second")
+
+    expected = set(first) - existing
+    same = set(second) == expected and len(second) == len(set(second))
+    print(
+        f"first run: {len(first)} objects, {len(existing)} of them in the platform; second run: {len(second)} objects "
+        f"(expected {len(expected)}): {'ok' if same else 'DIFFERENT'}"
+    )
+    sys.exit(0 if same else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Resume check: a run that fails midway, then the run that resumes it, against the stub helper
+
+The datasets are a synthetic DISARM workbook of a tenth of `--incidents` incidents, then a synthetic
+Fulde CSV of `--incidents` incidents. The first run sends its bundles to a stub platform failing
+every `--fail-every` sends, without retries, so it stops midway (in the Fulde CSV by default) and
+leaves its checkpoint in the connector state. The second run starts from that state with a working
+platform. Together they should send the objects of a single run (same IDs and content), the second
+run only generating and sending the incidents after the position of the checkpoint. Run from the repository root:
+
+    python benchmarks/resume_check.py --incidents 5000 --fail-every 8 --senders 0 3
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(BENCHMARKS, "..", "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, BENCHMARKS)
+
+import stub_helper  # noqa: E402
+import synthetic  # noqa: E402
+
+
+class RecordingHelper(stub_helper.StubHelper):
+    """Stub helper keeping the objects it receives, and the state given to it"""
+
+    initial_state = None
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.state = self.initial_state
+        self.received = {}
+
+    def send_stix2_bundle(self, bundle, update=False, work_id=None, **kwargs):
+        result = super().send_stix2_bundle(bundle, update, work_id, **kwargs)
+        for stix_object in json.loads(bundle)["objects"]:
+            self.received[stix_object["id"]] = stix_object
+        return result
+
+
+def run(workdir, name, fail_every=0, state=None) -> tuple:
+    """Runs the connector once, returns its helper and the number of objects it generated"""
+    os.environ["CONNECTOR_CACHE_DIR"] = os.path.join(workdir, name)
+    RecordingHelper.fail_every = fail_every
+    RecordingHelper.initial_state = state
+    from main import CustomConnector
+
+    connector = CustomConnector()
+    connector.helper.log_error = lambda message: None
+    try:
+        connector.run()
+    except SystemExit:
+        pass
+    generated = sum(source["objects"] for source in connector.metrics.summary()["sources"].values())
+    return connector.helper, generated
+
+
+def without_timestamps(objects) -> dict:
+    return {
+        stix_id: {key: value for key, value in stix_object.items() if key not in ("created", "modified")}
+        for stix_id, stix_object in objects.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--incidents", type=int, default=5000)
+    parser.add_argument("--fail-every", type=int, default=8, help="the first run fails on this send")
+    parser.add_argument("--senders", type=int, nargs="+", default=[0, 3], help="sender threads of the scenarios")
+    parser.add_argument("--bundle-objects", type=int, default=1000)
+    args = parser.parse_args()
+
+    codes = synthetic.technique_codes()
+    stub_helper.install(sorted(set(codes) | {code.split(".")[0] for code in codes}))
+    import pycti
+
+    pycti.OpenCTIConnectorHelper = RecordingHelper
+
+    ok = True
+    with tempfile.TemporaryDirectory() as workdir:
+        disarm_path = os.path.join(workdir, "disarm.xlsx")
+        fulde_path = os.path.join(workdir, "fulde.csv")
+        synthetic.generate_disarm_workbook(disarm_path, max(args.incidents // 10, 1))
+        synthetic.generate_fulde_csv(fulde_path, args.incidents)
+        with open(os.path.join(workdir, "sources.json"), "w") as f:
+            json.dump([
+                {"name": "disarm", "format": "disarm-xlsx", "path": disarm_path},
+                {"name": "fulde", "format": "fulde-csv", "path": fulde_path},
+            ], f)
+        os.environ.update({
+            "CONNECTOR_RUN_EVERY": "1d",
+            "CONNECTOR_SOURCES": os.path.join(workdir, "sources.json"),
+            "CONNECTOR_BUNDLE_MAX_OBJECTS": str(args.bundle_objects),
+            "CONNECTOR_SEND_RETRIES": "0",
+        })
+        os.chdir(SRC)
+
+        for senders in args.senders:
+            os.environ["CONNECTOR_SEND_WORKERS"] = str(senders)
+            single, single_generated = run(workdir, f"single-{senders}")
+            failed, failed_generated = run(workdir, f"failed-{senders}", args.fail_every)
+            checkpoint = json.loads(failed.state)["checkpoint"]
+            resumed, resumed_generated = run(workdir, f"failed-{senders}", state=failed.state)
+            union = dict(failed.received)
+            union.update(resumed.received)
+            same = (
+                without_timestamps(union) == without_timestamps(single.received)
+                and "checkpoint" not in json.loads(resumed.state)
+                and resumed.objects < single.objects
+                and resumed_generated < single_generated
+            )
+            ok = ok and same
+            print(
+                f"{senders} senders: single run {single.bundles} bundles, {single.objects} objects; "
+                f"failed run {failed.bundles} bundles, checkpoint at {checkpoint['progress']}; "
+                f"resumed run generated {resumed_generated} of {single_generated} objects, sent {resumed.bundles} bundles, "
+                f"{resumed.objects} objects: {'ok' if same else 'DIFFERENT'}"
+            )
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
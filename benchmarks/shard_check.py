@@ -0,0 +1,117 @@
+"""Shard check: runs the connector as N shards against the stub helper and compares with a single instance
+
+Every shard sends its own part of the incidents plus the shared entities it needs; the union of
+the objects sent by the shards should be the objects sent by one instance, with the same content,
+and each intrusion set should be sent by a single shard. The sources are the DISARM workbook and
+the Fulde CSV of the `datasets` directory, which share countries and threat actors; the Fulde CSV
+is loaded whole, then streamed in chunks of `--stream-chunk-rows` incidents. Run from the
+repository root:
+
+    python benchmarks/shard_check.py --shards 2 3 5 --stream-chunk-rows 25
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(BENCHMARKS, "..", "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, BENCHMARKS)
+
+import stub_helper  # noqa: E402
+import synthetic  # noqa: E402
+
+
+class RecordingHelper(stub_helper.StubHelper):
+    """Stub helper keeping the objects it receives"""
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.received = []
+
+    def send_stix2_bundle(self, bundle, update=False, work_id=None, **kwargs):
+        self.received.extend(json.loads(bundle)["objects"])
+        return super().send_stix2_bundle(bundle, update, work_id, **kwargs)
+
+
+def run(index, count, workdir) -> dict:
+    """Runs one instance, returns its objects by ID (without the timestamps of the run)"""
+    os.environ.update({
+        "CONNECTOR_SHARD_INDEX": str(index),
+        "CONNECTOR_SHARD_COUNT": str(count),
+        # Each instance has its own state and local files
+        "CONNECTOR_CACHE_DIR": os.path.join(workdir, f"cache-{index}-{count}"),
+    })
+    from main import CustomConnector
+
+    connector = CustomConnector()
+    try:
+        connector.run()
+    except SystemExit:
+        pass
+    return {
+        stix_object["id"]: {key: value for key, value in stix_object.items() if key not in ("created", "modified")}
+        for stix_object in connector.helper.received
+    }
+
+
+def check(counts, workdir, mode) -> bool:
+    """Compares the union of the shards of each count with a single instance"""
+    ok = True
+    single = run(0, 1, os.path.join(workdir, mode))
+    for count in counts:
+        shards = [run(index, count, os.path.join(workdir, mode)) for index in range(count)]
+        union = {}
+        conflicts = set()
+        for objects in shards:
+            for stix_id, stix_object in objects.items():
+                if union.setdefault(stix_id, stix_object) != stix_object:
+                    conflicts.add(stix_id)
+        intrusion_sets = [
+            stix_id for objects in shards for stix_id in objects if stix_id.startswith("intrusion-set--")
+        ]
+        same = union == single and not conflicts and len(intrusion_sets) == len(set(intrusion_sets))
+        ok = ok and same
+        print(
+            f"{mode}, {count} shards: {[len(objects) for objects in shards]} objects, union {len(union)}, "
+            f"single instance {len(single)}, {len(conflicts)} conflicting objects: {'same' if same else 'DIFFERENT'}"
+        )
+    return ok
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[2, 3, 5])
+    parser.add_argument("--stream-chunk-rows", type=int, default=25)
+    args = parser.parse_args()
+
+    from lib.sources import load_disarm_rows
+
+    codes = set(synthetic.technique_codes())
+    codes.update(code for row in load_disarm_rows(synthetic.DISARM_DATASET) for code in row["technique_ids"])
+    stub_helper.install(sorted(set(codes) | {code.split(".")[0] for code in codes}))
+    import pycti
+
+    pycti.OpenCTIConnectorHelper = RecordingHelper
+    os.environ.setdefault("CONNECTOR_RUN_EVERY", "1d")
+    os.chdir(SRC)
+
+    ok = True
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, "sources.json"), "w") as f:
+            json.dump([
+                {"name": "disarm", "format": "disarm-xlsx", "path": "datasets/DISARM_DATA_MASTER_additions.xlsx"},
+                {"name": "fulde", "format": "fulde-csv", "path": "datasets/Margot FuldeHardy_FIMI_Elections_Dataset_vF_07_01 copy.csv"},
+            ], f)
+        os.environ["CONNECTOR_SOURCES"] = os.path.join(workdir, "sources.json")
+        for chunk_rows in (0, args.stream_chunk_rows):
+            os.environ["CONNECTOR_STREAM_CHUNK_ROWS"] = str(chunk_rows)
+            ok = check(args.shards, workdir, "streamed" if chunk_rows else "loaded") and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""In-process stand-in for `pycti.OpenCTIConnectorHelper`, to run the connector without an OpenCTI platform
+
+Only what the connector uses is provided: the attack patterns of the DISARM framework
+(`api.attack_pattern.list`), the `ids` lookups of the objects already in the platform
+(`api.stix_domain_object.list` and `api.stix_core_relationship.list`), works, metrics, the connector
+state and `send_stix2_bundle`, which only counts what it receives (after an optional simulated latency,
+and failing every `fail_every` calls if asked to).
+
+`install()` makes `from pycti import OpenCTIConnectorHelper` return the stub, so the connector
+classes can be imported and run as they are.
+"""
+import json
+import sys
+import threading
+import time
+import types
+import uuid
+
+ATTACK_PATTERN_NAMESPACE = uuid.UUID("00abedb4-aa42-466c-9c01-fed23315a9b7")
+# Namespace of the standard IDs the stub platform gives to the objects it holds
+PLATFORM_NAMESPACE = uuid.UUID("6f1bd4a4-5f5c-4cf6-9d54-0a7c1bca1b6e")
+
+
+class _Metric:
+    def __init__(self):
+        self.counters = {}
+        self.current_state = None
+
+    def inc(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def state(self, state):
+        self.current_state = state
+
+
+class _AttackPatterns:
+    """`api.attack_pattern` with one attack pattern per DISARM code
+
+    The full listings and the paginated (i. e., freshness) queries are counted apart.
+    """
+
+    def __init__(self, codes):
+        self.listings = 0
+        self.page_queries = 0
+        self.patterns = [
+            {
+                "x_mitre_id": code,
+                "standard_id": f"attack-pattern--{uuid.uuid5(ATTACK_PATTERN_NAMESPACE, code)}",
+                "updated_at": "2024-01-01T00:00:00.000Z",
+            }
+            for code in codes
+        ]
+
+    def list(self, first=None, withPagination=False, **kwargs):
+        if withPagination:
+            self.page_queries += 1
+            return {
+                "entities": self.patterns[:first] if first else self.patterns,
+                "pagination": {"globalCount": len(self.patterns)},
+            }
+        self.listings += 1
+        return list(self.patterns)
+
+
+def _platform_entity(stix_id) -> dict:
+    """An object as OpenCTI holds it: its own standard ID, the ID sent by the connector in `x_opencti_stix_ids`"""
+    stix_type = stix_id.split("--")[0]
+    return {"standard_id": f"{stix_type}--{uuid.uuid5(PLATFORM_NAMESPACE, stix_id)}", "x_opencti_stix_ids": [stix_id]}
+
+
+class _StixObjects:
+    """`api.stix_domain_object` or `api.stix_core_relationship`, listing by the `ids` filter only
+
+    As in OpenCTI, the objects get a standard ID of their own and keep the ID they were sent with in
+    `x_opencti_stix_ids`: `ids` matches both, a `standard_id` filter on the connector IDs matches nothing.
+    Pages are returned as pycti does with `withPagination`, the cursor being the offset of the next
+    page. The number of calls and the most calls seen at the same time are recorded.
+    """
+
+    def __init__(self, existing, latency=0.0):
+        self.existing = existing
+        self.latency = latency
+        self.calls = 0
+        self.max_concurrent = 0
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def list(self, filters=None, first=100, after=None, withPagination=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self._running += 1
+            self.max_concurrent = max(self.max_concurrent, self._running)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            ids = [value for item in (filters or {}).get("filters", []) if item["key"] == "ids" for value in item["values"]]
+            matches = [_platform_entity(stix_id) for stix_id in ids if stix_id in self.existing]
+            offset = int(after or 0)
+            page = matches[offset:offset + first]
+            if not withPagination:
+                return page
+            has_next = offset + first < len(matches)
+            return {
+                "entities": page,
+                "pagination": {"globalCount": len(matches), "hasNextPage": has_next, "endCursor": str(offset + first) if has_next else None},
+            }
+        finally:
+            with self._lock:
+                self._running -= 1
+
+
+class _Work:
+    def initiate_work(self, connector_id, friendly_name):
+        return f"work--{uuid.uuid4()}"
+
+    def to_processed(self, work_id, message, in_error=False):
+        pass
+
+
+class StubHelper:
+    """Stand-in for `OpenCTIConnectorHelper`
+
+    Attributes:
+        codes (list): DISARM codes of the attack patterns known by the stub platform (class attribute).
+        existing (set): STIX IDs of the objects already in the stub platform (class attribute).
+        latency (float): Seconds spent in each `send_stix2_bundle` and lookup call (class attribute).
+        fail_every (int): Every how many calls `send_stix2_bundle` fails, 0 for never (class attribute).
+        bundles (int): Number of bundles received.
+        objects (int): Number of objects received.
+        bytes (int): Size of the bundles received.
+        failures (int): Calls of `send_stix2_bundle` that failed.
+    """
+
+    codes = []
+    existing = set()
+    latency = 0.0
+    fail_every = 0
+
+    def __init__(self, config=None):
+        self.connect_name = "Benchmark"
+        self.connect_id = str(uuid.uuid4())
+        self.connect_run_and_terminate = True
+        self.api = types.SimpleNamespace(
+            attack_pattern=_AttackPatterns(self.codes),
+            stix_domain_object=_StixObjects(self.existing, self.latency),
+            stix_core_relationship=_StixObjects(self.existing, self.latency),
+            work=_Work(),
+        )
+        self.metric = _Metric()
+        self.state = None
+        self.bundles = 0
+        self.objects = 0
+        self.bytes = 0
+        self.failures = 0
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    def get_state(self):
+        return None if self.state is None else json.loads(self.state)
+
+    def set_state(self, state):
+        self.state = json.dumps(state)
+
+    def send_stix2_bundle(self, bundle, update=False, work_id=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._calls += 1
+            if self.fail_every and self._calls % self.fail_every == 0:
+                self.failures += 1
+                raise ConnectionError("Simulated failure of the broker")
+            self.bundles += 1
+            self.objects += bundle.count('"spec_version"')
+            self.bytes += len(bundle)
+        return [bundle]
+
+    def log_debug(self, message):
+        pass
+
+    def log_info(self, message):
+        pass
+
+    def log_warning(self, message):
+        pass
+
+    def log_error(self, message):
+        print(f"ERROR {message}", file=sys.stderr)
+
+
+def install(codes, latency=0.0, existing=(), fail_every=0) -> type:
+    """Makes `pycti.OpenCTIConnectorHelper` the stub helper, knowing the attack patterns of `codes`
+    and the objects of the `existing` STIX IDs"""
+    StubHelper.codes = list(codes)
+    StubHelper.existing = set(existing)
+    StubHelper.latency = latency
+    StubHelper.fail_every = fail_every
+    try:
+        import pycti
+    except ImportError:
+        pycti = types.ModuleType("pycti")
+        sys.modules["pycti"] = pycti
+    pycti.OpenCTIConnectorHelper = StubHelper
+    return StubHelper
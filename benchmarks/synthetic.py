@@ -0,0 +1,138 @@
+"""Synthetic FIMI datasets: Fulde-format CSVs and DISARM-format workbooks of any number of incidents
+
+The column layout, the density of each technique and channel column and the actor and country
+vocabularies are taken from the datasets bundled with the connector, so larger datasets keep the
+shape of the real ones. Run from the repository root to write a dataset:
+
+    python benchmarks/synthetic.py fulde /tmp/fulde.csv --incidents 100000
+    python benchmarks/synthetic.py disarm /tmp/disarm.xlsx --incidents 10000
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from lib.disarm_workbook import INCIDENT_TECHNIQUES_SHEET, INCIDENTS_SHEET  # noqa: E402
+from lib.margot_dataset_importer import FuldeSchema  # noqa: E402
+
+DATASETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "datasets")
+FULDE_DATASET = os.path.join(DATASETS, "merged_Foulde_DSRM_additions.csv")
+DISARM_DATASET = os.path.join(DATASETS, "DISARM_DATA_MASTER_additions.xlsx")
+
+# Rows written at once, bounds the memory used for the largest datasets
+BLOCK_ROWS = 100000
+# Rows of an xlsx sheet (header included)
+XLSX_MAX_ROWS = 1048576
+
+
+def _vocabulary(values, extra, prefix):
+    """Values seen in the real dataset (with their frequency) plus `extra` synthetic ones"""
+    counts = pd.Series(values).dropna().astype(str).value_counts()
+    names = list(counts.index) + [f"{prefix} {i}" for i in range(extra)]
+    # Synthetic values form a long tail of rare names
+    weights = np.concatenate([counts.to_numpy(dtype=float), np.full(extra, 0.2)])
+    return np.asarray(names, dtype=object), weights / weights.sum()
+
+
+def technique_codes():
+    """DISARM codes of the technique columns of the Fulde dataset"""
+    return sorted(set(FuldeSchema(pd.read_csv(FULDE_DATASET, nrows=0).columns).technique_codes))
+
+
+def generate_fulde_csv(path, incidents, seed=0) -> None:
+    """Writes a Fulde-format CSV of `incidents` synthetic incidents"""
+    template = pd.read_csv(FULDE_DATASET)
+    schema = FuldeSchema(template.columns)
+    rng = np.random.default_rng(seed)
+
+    flag_columns = schema.technique_columns + schema.channel_columns
+    # Probability of each technique and channel, as in the real dataset
+    density = (template[flag_columns] == 1).mean().to_numpy()
+    actors, actor_weights = _vocabulary(template[schema.fields['threat_actor']], max(incidents // 100, 10), "Actor")
+    countries, country_weights = _vocabulary(template[schema.fields['target_country']], 50, "Country")
+    origins, origin_weights = _vocabulary(template[schema.fields['country_of_origin']], 20, "Origin")
+
+    for start in range(0, incidents, BLOCK_ROWS):
+        rows = min(BLOCK_ROWS, incidents - start)
+        index = np.arange(start, start + rows)
+        block = pd.DataFrame(index=index, columns=template.columns, dtype=object)
+        fields = schema.fields
+        block[fields['year']] = rng.integers(2010, 2025, rows)
+        block[fields['target_country']] = rng.choice(countries, rows, p=country_weights)
+        block[fields['event']] = [f"Synthetic incident {i}" for i in index]
+        block[fields['region']] = "Europe"
+        block[fields['sub_region']] = "Western Europe"
+        block[fields['country_of_origin']] = rng.choice(origins, rows, p=origin_weights)
+        block[fields['threat_actor']] = rng.choice(actors, rows, p=actor_weights)
+        block[fields['event_description']] = [f"Description of the synthetic incident {i}" for i in index]
+        flags = (rng.random((rows, len(flag_columns))) < density).astype(np.int8)
+        block[flag_columns] = np.where(flags == 1, 1, np.nan)
+        sources = rng.integers(1, len(schema.source_columns) + 1, rows)
+        for position, column in enumerate(schema.source_columns):
+            block[column] = np.where(sources > position, [f"https://example.org/{i}/{position}" for i in index], None)
+        block.to_csv(path, index=False, header=start == 0, mode="w" if start == 0 else "a")
+
+
+def generate_disarm_workbook(path, incidents, seed=0) -> None:
+    """Writes a DISARM-format workbook (incidents and incidenttechniques sheets) of `incidents` incidents
+
+    Raises:
+        ValueError: If the incidenttechniques sheet would not fit in an xlsx sheet.
+    """
+    from openpyxl import Workbook
+
+    with pd.ExcelFile(DISARM_DATASET) as xls:
+        template = pd.read_excel(xls, sheet_name=INCIDENTS_SHEET)
+        template_techniques = pd.read_excel(xls, sheet_name=INCIDENT_TECHNIQUES_SHEET)
+    rng = np.random.default_rng(seed)
+
+    codes = np.asarray(technique_codes(), dtype=object)
+    techniques_per_incident = len(template_techniques) / len(template)
+    counts = rng.poisson(techniques_per_incident, incidents)
+    if counts.sum() + 1 > XLSX_MAX_ROWS:
+        raise ValueError(f"{counts.sum()} incident techniques do not fit in an xlsx sheet")
+    actors, actor_weights = _vocabulary(template["attributions_seen"], max(incidents // 100, 10), "Actor")
+    countries, country_weights = _vocabulary(template["found_in_country"], 50, "Country")
+
+    workbook = Workbook(write_only=True)
+    incidents_sheet = workbook.create_sheet(INCIDENTS_SHEET)
+    incidents_sheet.append(list(template.columns))
+    techniques_sheet = workbook.create_sheet(INCIDENT_TECHNIQUES_SHEET)
+    techniques_sheet.append(list(template_techniques.columns))
+    years = rng.integers(2010, 2025, incidents)
+    incident_actors = rng.choice(actors, incidents, p=actor_weights)
+    incident_countries = rng.choice(countries, incidents, p=country_weights)
+    technique = 0
+    for i in range(incidents):
+        incident_id = f"I{i:07d}"
+        incidents_sheet.append([
+            incident_id, f"Synthetic incident {i}", "incident", f"Summary of the synthetic incident {i}",
+            int(years[i]), incident_actors[i], incident_countries[i], f"https://example.org/{i}", None,
+            "2024-01-01", None, f"{incident_id} - Synthetic incident {i}",
+        ])
+        for code in rng.choice(codes, counts[i], replace=False):
+            technique += 1
+            techniques_sheet.append([f"IT{technique:08d}", f"Technique {code} of {incident_id}", incident_id, code, None])
+    workbook.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("format", choices=["fulde", "disarm"])
+    parser.add_argument("path")
+    parser.add_argument("--incidents", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.format == "fulde":
+        generate_fulde_csv(args.path, args.incidents, args.seed)
+    else:
+        generate_disarm_workbook(args.path, args.incidents, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Template check: the plain-dict templates and the stix2 objects of a run serialize to the same JSON
+
+Generates the bundled datasets (or synthetic ones) twice, with `CONNECTOR_STIX_VALIDATION` off
+(plain STIX dicts) and on (`stix2` objects), plus a note per threat actor, and compares the
+bundle of every incident and the bundle of the whole run, byte for byte, with each bundle
+serializer (json, and orjson when installed). Run from the repository root:
+
+    python benchmarks/template_check.py
+    python benchmarks/template_check.py --synthetic 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import uuid
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(BENCHMARKS, "..", "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, BENCHMARKS)
+
+import stub_helper  # noqa: E402
+import synthetic  # noqa: E402
+from lib.bundle_serializer import JsonBundleSerializer, OrjsonBundleSerializer, orjson  # noqa: E402
+from lib.generators import GENERATORS  # noqa: E402
+from lib.sources import load_disarm_rows, load_fulde_rows  # noqa: E402
+from lib.stix_graph import StixGraphBuilder  # noqa: E402
+from lib.technique_resolver import TechniqueResolver  # noqa: E402
+
+NAMESPACE = uuid.UUID("12345678-1234-5678-1234-567812345678")
+# As the timestamps of the connector runs (see `RunCheckpoint`)
+TIMESTAMP = "2024-01-01T00:00:00.000Z"
+
+
+def technique_ids() -> dict:
+    """STIX IDs of the DISARM techniques, as the stub platform knows them"""
+    codes = synthetic.technique_codes()
+    return {
+        code: f"attack-pattern--{uuid.uuid5(stub_helper.ATTACK_PATTERN_NAMESPACE, code)}"
+        for code in sorted(set(codes) | {code.split(".")[0] for code in codes})
+    }
+
+
+def build_groups(datasets, validate) -> list:
+    """Returns the groups of objects of the datasets, then one group per note"""
+    graph = StixGraphBuilder(NAMESPACE, validate, TIMESTAMP)
+    resolver = TechniqueResolver(technique_ids())
+    groups = []
+    for kind, rows in datasets:
+        generate = GENERATORS[kind]
+        groups.extend(graph.group(generate(row, resolver, graph)) for row in rows)
+    actors = sorted({stix_object["id"] for group in groups for stix_object in group if stix_object["type"] == "threat-actor"})
+    for actor_id in actors:
+        actor = graph.node(actor_id)
+        groups.append([graph.note(
+            f"check|{actor_id}", f"Note on {actor['name']}", f"Content of the note on {actor['name']}", [actor_id]
+        ), actor])
+    return groups
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--synthetic", type=int, default=0, help="incidents of synthetic datasets, 0 for the bundled ones")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.synthetic:
+            fulde_path = os.path.join(workdir, "fulde.csv")
+            disarm_path = os.path.join(workdir, "disarm.xlsx")
+            synthetic.generate_fulde_csv(fulde_path, args.synthetic)
+            synthetic.generate_disarm_workbook(disarm_path, min(args.synthetic, 2000))
+        else:
+            fulde_path = os.path.join(SRC, "datasets", "merged_Foulde_DSRM_additions.csv")
+            disarm_path = os.path.join(SRC, "datasets", "DISARM_DATA_MASTER_additions.xlsx")
+        datasets = [("disarm", load_disarm_rows(disarm_path)), ("margotfulde", load_fulde_rows(fulde_path))]
+        templates = build_groups(datasets, validate=False)
+        validated = build_groups(datasets, validate=True)
+
+    serializers = [JsonBundleSerializer()] + ([OrjsonBundleSerializer()] if orjson is not None else [])
+    ok = len(templates) == len(validated)
+    for serializer in serializers:
+        different = [
+            index for index, (plain, stix2_objects) in enumerate(zip(templates, validated))
+            if serializer.bundle(plain) != serializer.bundle(stix2_objects)
+        ]
+        whole = serializer.bundle([o for group in templates for o in group]) == serializer.bundle(
+            [o for group in validated for o in group]
+        )
+        ok = ok and not different and whole
+        print(
+            f"{serializer.name}: {len(templates)} groups, {sum(len(group) for group in templates)} objects, "
+            f"{len(different)} different bundles (first: {different[:5]}), whole run: {'same' if whole else 'DIFFERENT'}"
+        )
+    if len(serializers) > 1:
+        # Both serializers write the same bytes, whichever way the objects were built
+        same = all(
+            serializers[0].bundle(group) == serializers[1].bundle(group) for groups in (templates, validated) for group in groups
+        )
+        ok = ok and same
+        print(f"json and orjson: {'same' if same else 'DIFFERENT'}")
+    else:
+        print("orjson is not installed, only the json serializer was checked")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 #!/bin/sh
 
-# Start the connector (WORKDIR is /opt/connector as set in the Dockerfile)
-python3 main.py
+# Start the connector (WORKDIR is /opt/connector as set in the Dockerfile), through start.py, which
+# exits right away when the connector runs and terminates and no run is due
+python3 start.py
@@ -0,0 +1,282 @@
+import json
+import os
+from collections import Counter
+
+from lib.delta import content_hash
+from lib.entity_normalizer import canonical_actor, canonical_country, deterministic_id
+
+# Count matrices of the index: name -> (row, column) of their keys
+MATRICES = {
+    "cooccurrence": ("technique", "technique"),
+    "actor_technique": ("actor", "technique"),
+    "country_technique": ("country", "technique"),
+    "year_technique": ("year", "technique"),
+    "year": ("year", None),
+}
+
+# Matrices whose rows are published as notes, with the type of the entity of a row
+NOTE_ROWS = {
+    "actor_technique": "threat-actor",
+    "country_technique": "location",
+}
+
+
+def _names(field, canonical) -> list:
+    values = (canonical(value) for value in field.split(",")) if isinstance(field, str) else ()
+    return sorted({value for value in values if value})
+
+
+def _year(value):
+    try:
+        return str(int(float(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+def margotfulde_facets(incident) -> dict:
+    """Techniques, actors, countries and year of an incident of a Fulde-format dataset"""
+    return {
+        "techniques": sorted(set(incident['techniques'])),
+        "actors": _names(incident['threat_actor'], canonical_actor) or ["Unknown"],
+        "countries": _names(incident['target_country'], canonical_country),
+        "year": _year(incident['year']),
+    }
+
+
+def disarm_facets(row) -> dict:
+    """Techniques, actors, countries and year of an incident of the DISARM workbook"""
+    return {
+        "techniques": sorted(set(row['technique_ids'])),
+        "actors": _names(row['attributions_seen'], canonical_actor) or ["Unknown"],
+        "countries": _names(row['found_in_country'], canonical_country),
+        "year": _year(row['year_started']),
+    }
+
+
+# Facets of the incidents of each dataset format
+FACETS = {
+    "margotfulde": margotfulde_facets,
+    "disarm": disarm_facets,
+}
+
+
+# Facet giving the rows of the technique matrices
+MATRIX_FACETS = {
+    "actor_technique": "actors",
+    "country_technique": "countries",
+    "year_technique": "year",
+}
+
+
+def _facet_values(facets, facet) -> list:
+    if facet == "year":
+        return [] if facets["year"] is None else [facets["year"]]
+    return facets[facet]
+
+
+def _weighted_counts(entries, block_rows=10000):
+    """Sums the counts of incidents into the matrices of the index
+
+    The matrices are summed as dense arrays over the techniques, actors, countries and years of the
+    entries only, `block_rows` incidents at a time; only their non-zero cells become keys.
+
+    Args:
+        entries (list): (facets, weight) of the incidents, the weight being the number of incidents
+                        to add (or subtract, when negative).
+
+    Returns:
+        dict: (matrix, row, column) -> count, without the zero counts.
+    """
+    # Imported here, as in `lib/dataset_cache.py`, so that the connector starts without numpy
+    import numpy as np
+
+    techniques = sorted({technique for facets, _ in entries for technique in facets["techniques"]})
+    columns = {technique: column for column, technique in enumerate(techniques)}
+    rows = {name: {} for name in MATRIX_FACETS}
+    for facets, _ in entries:
+        for name, facet in MATRIX_FACETS.items():
+            for key in _facet_values(facets, facet):
+                rows[name].setdefault(key, len(rows[name]))
+    # Float arrays, for BLAS products (exact, the counts staying far below 2 ** 53)
+    cooccurrence = np.zeros((len(techniques), len(techniques)))
+    sums = {name: np.zeros((len(keys), len(techniques))) for name, keys in rows.items()}
+
+    for start in range(0, len(entries), block_rows):
+        block = entries[start:start + block_rows]
+        # Incident x technique flags, and the same weighted by the number of incidents
+        flags = np.zeros((len(block), len(techniques)))
+        for row, (facets, _) in enumerate(block):
+            flags[row, [columns[technique] for technique in facets["techniques"]]] = 1
+        weighted = flags * np.array([weight for _, weight in block], dtype=float)[:, None]
+        cooccurrence += flags.T @ weighted
+        # Techniques of the incidents of each actor, country or year
+        for name, facet in MATRIX_FACETS.items():
+            incidents = []
+            keys = []
+            for row, (facets, _) in enumerate(block):
+                for key in _facet_values(facets, facet):
+                    incidents.append(row)
+                    keys.append(rows[name][key])
+            if incidents:
+                np.add.at(sums[name], np.array(keys), weighted[np.array(incidents)])
+
+    # Each pair of techniques once: the techniques are sorted, so the upper triangle
+    cooccurrence = np.triu(cooccurrence, k=1)
+    totals = {
+        ("cooccurrence", techniques[first], techniques[second]): int(round(cooccurrence[first, second]))
+        for first, second in zip(*np.nonzero(cooccurrence))
+    }
+    for name, keys in rows.items():
+        keys = list(keys)
+        counts = sums[name]
+        for row, column in zip(*np.nonzero(counts)):
+            totals[(name, keys[row], techniques[column])] = int(round(counts[row, column]))
+    years = Counter()
+    for facets, weight in entries:
+        if facets["year"] is not None:
+            years[("year", facets["year"], None)] += weight
+    totals.update((key, count) for key, count in years.items() if count)
+    return totals
+
+
+class AggregateIndex:
+    """Local counts of the techniques of the incidents, by technique, actor, country and year
+
+    The index holds sparse count matrices (dicts of (row, column) keys): technique co-occurrence
+    within incidents, actor x technique, country x technique and year x technique, and the number
+    of incidents per year. It is kept in `path` between runs and updated incrementally: every
+    incident is known by its content hash (as in `DeltaTracker`) along with its facets, so the
+    incidents added, changed or removed since the last run only add or subtract their own counts,
+    without recomputing the matrices from the whole datasets.
+
+    The incidents of a source are passed to `observe()` as they are loaded (all of them, not only
+    the changed ones). `apply()` then updates the counts of the sources observed, and the index is
+    only written by `save()`, once the run succeeded.
+
+    Attributes:
+        path (str): JSON file of the index.
+        counts (dict): Matrix name -> Counter of (row, column) -> count.
+        incidents (dict): Source -> incident hash -> [number of incidents with this hash, facets].
+        dirty (set): (matrix, row) whose counts changed in the last `apply()`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.counts = {name: Counter() for name in MATRICES}
+        self.incidents = {}
+        self.dirty = set()
+        self._seen = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for name, entries in data.get("counts", {}).items():
+            if name in self.counts:
+                self.counts[name] = Counter({(row, column): count for row, column, count in entries})
+        self.incidents = data.get("incidents", {})
+
+    def save(self) -> None:
+        """Writes the index to its file"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        # `dumps()` rather than `dump()`, which does not use the C encoder
+        data = json.dumps({
+            "counts": {
+                name: [[row, column, count] for (row, column), count in counts.items()]
+                for name, counts in self.counts.items()
+            },
+            "incidents": self.incidents,
+        }, separators=(",", ":"))
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def observe(self, source, kind, incidents) -> None:
+        """Records (part of) the current incidents of a source"""
+        seen = self._seen.setdefault(source, {})
+        known = self.incidents.get(source, {})
+        facets = FACETS[kind]
+        for incident in incidents:
+            incident_hash = content_hash(incident)
+            entry = seen.get(incident_hash)
+            if entry is not None:
+                entry[0] += 1
+            elif incident_hash in known:
+                seen[incident_hash] = [1, known[incident_hash][1]]
+            else:
+                seen[incident_hash] = [1, facets(incident)]
+
+    def _add(self, entries) -> None:
+        """Adds the counts of (facets, number of incidents) entries, negative numbers subtracting them"""
+        for (name, row, column), count in _weighted_counts(entries).items():
+            counts = self.counts[name]
+            counts[(row, column)] += count
+            if counts[(row, column)] <= 0:
+                del counts[(row, column)]
+            self.dirty.add((name, row))
+
+    def apply(self, sources=None) -> int:
+        """Updates the counts with the incidents observed since the last `apply()`
+
+        The sources observed replace their previous incidents; the others keep them, except those
+        not in `sources` (when given), which are dropped. Returns the number of incidents whose
+        counts were added or subtracted.
+        """
+        self.dirty = set()
+        entries = []
+        removed_sources = [source for source in self.incidents if sources is not None and source not in sources]
+        for source in removed_sources:
+            self._seen.setdefault(source, {})
+        for source, seen in self._seen.items():
+            known = self.incidents.get(source, {})
+            for incident_hash in known.keys() | seen.keys():
+                before = known.get(incident_hash, [0, None])
+                after = seen.get(incident_hash, [0, None])
+                if before[0] != after[0]:
+                    entries.append((after[1] or before[1], after[0] - before[0]))
+            if seen:
+                self.incidents[source] = seen
+            else:
+                self.incidents.pop(source, None)
+        self._seen = {}
+        self._add(entries)
+        return sum(abs(weight) for _, weight in entries)
+
+    def row(self, name, row) -> Counter:
+        """Columns of a row of a matrix and their counts (i. e., the techniques of an actor)"""
+        return Counter({column: count for (key, column), count in self.counts[name].items() if key == row})
+
+    def notes(self, graph, top=20) -> list:
+        """Notes summarizing the rows of the actor and country matrices changed by the last `apply()`
+
+        One group per note: the note and, when it is part of the run graph, the entity it is about.
+        A row that no longer has any count gets no note.
+        """
+        rows = {}
+        for name, row in self.dirty:
+            if name in NOTE_ROWS:
+                rows.setdefault(name, set()).add(row)
+        groups = []
+        for name in sorted(rows):
+            stix_type = NOTE_ROWS[name]
+            counts = {}
+            for (key, column), count in self.counts[name].items():
+                if key in rows[name]:
+                    counts.setdefault(key, Counter())[column] = count
+            for key in sorted(counts):
+                entity_id = deterministic_id(graph.namespace, stix_type, key)
+                techniques = counts[key].most_common(top)
+                content = "\n".join(f"- {technique}: {count} incidents" for technique, count in techniques)
+                note = graph.note(
+                    f"aggregate|{name}|{key}",
+                    f"DISARM techniques of {key} ({len(counts[key])} techniques)",
+                    f"Most used DISARM techniques in the incidents of {key}:\n\n{content}",
+                    [entity_id],
+                )
+                entity = graph.node(entity_id)
+                groups.append([note] if entity is None else [note, entity])
+        return groups
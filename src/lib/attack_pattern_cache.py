@@ -0,0 +1,92 @@
+import json
+import os
+import time
+
+from lib.technique_resolver import TechniqueResolver
+
+# Format of the cache file: bump it when its content changes, files of other versions are refetched
+CACHE_VERSION = 1
+
+
+class AttackPatternCache:
+    """On-disk cache of the DISARM `x_mitre_id` -> `standard_id` map
+
+    The full attack pattern listing is only requested from the platform when the cache is missing
+    (or unreadable) or stale. Once the TTL has expired, a single cheap query (number of attack patterns and newest
+    `updated_at`) tells whether the framework changed; if it did not, the cached map is kept.
+
+    Attributes:
+        path (str): JSON file holding the cached map.
+        ttl (int): Seconds during which the cache is used without asking the platform.
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+
+    def _read(self):
+        """Returns the cached content, None when the file is missing or not a cache of this version"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # i. e., a partial write or a file of another version
+        if (
+            not isinstance(cache, dict)
+            or cache.get("version") != CACHE_VERSION
+            or not isinstance(cache.get("fetched_at"), (int, float))
+            or not isinstance(cache.get("ids"), dict)
+            or not isinstance(cache.get("fingerprint"), (dict, type(None)))
+        ):
+            return None
+        return cache
+
+    def _write(self, cache):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _fingerprint(api):
+        """Returns the number of attack patterns and the newest `updated_at` in the platform"""
+        result = api.attack_pattern.list(
+            first=1,
+            orderBy="updated_at",
+            orderMode="desc",
+            withPagination=True,
+            customAttributes="id updated_at",
+        )
+        entities = result.get("entities") or []
+        return {
+            "count": result.get("pagination", {}).get("globalCount"),
+            "updated_at": entities[0].get("updated_at") if entities else None,
+        }
+
+    def load(self, helper) -> dict:
+        """Returns the `x_mitre_id` -> `standard_id` map, refreshing the cache when needed"""
+        now = time.time()
+        cache = self._read()
+
+        if cache is not None and now - cache["fetched_at"] < self.ttl:
+            helper.log_debug(f"Using cached DISARM attack patterns from {self.path}")
+            return cache["ids"]
+
+        try:
+            fingerprint = self._fingerprint(helper.api)
+        except Exception as e:
+            helper.log_warning(f"Could not check the DISARM attack patterns freshness: {str(e)}")
+            fingerprint = None
+
+        if cache is not None and fingerprint is not None and cache.get("fingerprint") == fingerprint:
+            helper.log_debug("DISARM attack patterns unchanged, extending the cache")
+            cache["fetched_at"] = now
+            self._write(cache)
+            return cache["ids"]
+
+        helper.log_info("Fetching the DISARM attack patterns from the platform...")
+        ids = TechniqueResolver.from_attack_patterns(helper.api.attack_pattern.list()).ids
+        self._write({"version": CACHE_VERSION, "fetched_at": now, "fingerprint": fingerprint, "ids": ids})
+        return ids
@@ -0,0 +1,88 @@
+import json
+
+import stix2
+
+
+# Bytes of the bundle envelope ({"type": "bundle", "id": ..., "objects": []}) and of the separator between objects
+BUNDLE_OVERHEAD = 128
+SEPARATOR_SIZE = 2
+
+
+def object_size(stix_object) -> int:
+    """Returns the size in bytes of the JSON serialization of a STIX object within a bundle"""
+    if isinstance(stix_object, dict):
+        data = json.dumps(stix_object, cls=stix2.base.STIXJSONEncoder)
+    else:
+        data = stix_object.serialize()
+    return len(data.encode("utf-8")) + SEPARATOR_SIZE
+
+
+class BundleChunker:
+    """Packs groups of STIX objects into bundles of bounded size and sends each one as it fills
+
+    A group holds the objects that have to travel together (i. e., an intrusion set, the actors and
+    locations it relates to, and the relationships between them). Groups are never split, so every
+    relationship finds its source and target in the same bundle and each bundle can be ingested on
+    its own. Objects repeated inside a bundle (the same location for several incidents) are only
+    added once.
+
+    Attributes:
+        send (callable): Called with the list of objects of each full bundle.
+        max_objects (int): Maximum number of objects per bundle (0 for no limit).
+        max_bytes (int): Maximum serialized size per bundle (0 for no limit).
+        size (callable): Returns the serialized size of an object, used with `max_bytes`.
+        bundles (int): Number of bundles sent.
+        objects (int): Number of objects sent.
+    """
+
+    def __init__(self, send, max_objects=0, max_bytes=0, size=object_size):
+        self.send = send
+        self.max_objects = max_objects
+        self.max_bytes = max_bytes
+        self.size = size
+        self.bundles = 0
+        self.objects = 0
+        self._objects = []
+        self._ids = set()
+        self._bytes = 0
+
+    def _new_objects(self, group):
+        new_objects = []
+        ids = set()
+        for stix_object in group:
+            if stix_object["id"] not in self._ids and stix_object["id"] not in ids:
+                ids.add(stix_object["id"])
+                new_objects.append(stix_object)
+        return new_objects
+
+    def _fits(self, new_objects, new_bytes) -> bool:
+        if self.max_objects and len(self._objects) + len(new_objects) > self.max_objects:
+            return False
+        if self.max_bytes and BUNDLE_OVERHEAD + self._bytes + new_bytes > self.max_bytes:
+            return False
+        return True
+
+    def add(self, group) -> None:
+        """Adds a group of objects, sending the current bundle first if the group does not fit"""
+        new_objects = self._new_objects(group)
+        new_bytes = sum(self.size(o) for o in new_objects) if self.max_bytes else 0
+        if self._objects and not self._fits(new_objects, new_bytes):
+            self.flush()
+            # Objects already sent in the previous bundle are needed again in this one
+            new_objects = self._new_objects(group)
+            new_bytes = sum(self.size(o) for o in new_objects) if self.max_bytes else 0
+
+        self._objects.extend(new_objects)
+        self._ids.update(o["id"] for o in new_objects)
+        self._bytes += new_bytes
+
+    def flush(self) -> None:
+        """Sends the current bundle, if any"""
+        if not self._objects:
+            return
+        self.send(self._objects)
+        self.bundles += 1
+        self.objects += len(self._objects)
+        self._objects = []
+        self._ids = set()
+        self._bytes = 0
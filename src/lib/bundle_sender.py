@@ -0,0 +1,123 @@
+import queue
+import threading
+import time
+
+# Put in the queue once per thread to stop the senders
+_STOP = object()
+
+
+class BundleSender:
+    """Sends the bundles of a run from background threads while the next ones are generated
+
+    `submit()` puts a bundle in a queue of at most `queue_size` bundles, which `workers` threads send
+    to OpenCTI. When the queue is full (the platform or its broker falls behind), `submit()` waits
+    for room, which throttles the generation. The bundles are self-contained (see `BundleChunker`),
+    so they can be sent in any order. A send that fails is retried `retries` times, after `backoff`
+    seconds, then twice as long each time, up to `max_backoff`. Without workers, `submit()` sends
+    the bundle itself.
+
+    `on_sent` is called once a bundle is sent, with the bundle, its latency in seconds (retries
+    included), the number of attempts and the number of bundles still queued. The calls never
+    overlap, and the other senders wait for them: the callback only records the bundle (no platform
+    round-trip, such as saving the connector state). When a bundle cannot be sent, the
+    bundles still queued are dropped and the error is raised by the next `submit()` or by `close()`.
+
+    Attributes:
+        send (callable): Sends a bundle, raising an exception when it fails.
+        on_sent (callable): Called with (bundle, seconds, attempts, queue depth) after each bundle sent.
+        workers (int): Sender threads (0 to send in `submit()`).
+        queue_size (int): Bundles queued at most.
+        retries (int): Retries of a failed send.
+        backoff (float): Seconds before the first retry.
+        max_backoff (float): Longest wait between two attempts.
+        wait_seconds (float): Time `submit()` and `close()` waited for the senders.
+        max_depth (int): Most bundles queued at once.
+        retried (int): Retries made.
+    """
+
+    def __init__(self, send, on_sent, workers=1, queue_size=4, retries=3, backoff=1.0, max_backoff=30.0):
+        self.send = send
+        self.on_sent = on_sent
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.wait_seconds = 0.0
+        self.max_depth = 0
+        self.retried = 0
+        self._queue = queue.Queue(maxsize=max(queue_size, 1))
+        self._lock = threading.Lock()
+        self._error = None
+        self._threads = [
+            threading.Thread(target=self._work, name=f"bundle-sender-{index}", daemon=True)
+            for index in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _send(self, bundle) -> None:
+        start = time.perf_counter()
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                self.send(bundle)
+                break
+            except Exception:
+                # No more retries once another bundle failed, the run stops anyway
+                if attempts > self.retries or self._error is not None:
+                    raise
+                with self._lock:
+                    self.retried += 1
+                time.sleep(min(self.max_backoff, self.backoff * 2 ** (attempts - 1)))
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self.on_sent(bundle, seconds, attempts, self._queue.qsize())
+
+    def _work(self) -> None:
+        while True:
+            bundle = self._queue.get()
+            try:
+                if bundle is _STOP:
+                    return
+                # After a failure, the queue is still emptied so that `submit()` does not block
+                if self._error is None:
+                    self._send(bundle)
+            except Exception as e:
+                with self._lock:
+                    if self._error is None:
+                        self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def submit(self, bundle) -> None:
+        """Queues a bundle to send, waiting while the queue is full"""
+        self._raise_error()
+        if not self._threads:
+            self._send(bundle)
+            return
+        start = time.perf_counter()
+        self._queue.put(bundle)
+        self.wait_seconds += time.perf_counter() - start
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    def close(self, raise_error=True) -> None:
+        """Waits for the queued bundles to be sent and stops the threads
+
+        Raises:
+            Exception: The error of a bundle that could not be sent (unless `raise_error` is false).
+        """
+        start = time.perf_counter()
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.wait_seconds += time.perf_counter() - start
+        if raise_error:
+            self._raise_error()
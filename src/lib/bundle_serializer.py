@@ -0,0 +1,88 @@
+import hashlib
+import json
+import uuid
+
+import stix2
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard json module is used instead
+    orjson = None
+
+
+# Namespace of the bundle IDs, which are derived from the bundle content
+BUNDLE_NAMESPACE = uuid.UUID("6ba7b811-9dad-11d1-80b4-00c04fd430c8")
+
+
+class JsonBundleSerializer:
+    """Serializes STIX bundles with the standard json module
+
+    The bundle is written straight from the already built objects (stix2 objects or plain dicts),
+    without building a `stix2.Bundle`. Objects are sorted by ID and keys are sorted too, and the
+    bundle ID is derived from the content, so the same objects always give the same bytes.
+    """
+
+    name = "json"
+
+    def dumps(self, value) -> bytes:
+        return json.dumps(
+            value, cls=stix2.base.STIXJSONEncoder, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        ).encode("utf-8")
+
+    def object_size(self, stix_object) -> int:
+        """Returns the number of bytes of an object in a bundle (separator included)"""
+        return len(self.dumps(stix_object)) + 1
+
+    def bundle(self, objects) -> tuple:
+        """Returns the ID and the serialization of the bundle of some objects"""
+        objects = sorted(objects, key=lambda stix_object: stix_object["id"])
+        data = self.dumps(objects)
+        bundle_id = f"bundle--{uuid.uuid5(BUNDLE_NAMESPACE, hashlib.sha256(data).hexdigest())}"
+        # Keys in sorted order, as in the objects
+        return bundle_id, b'{"id":"' + bundle_id.encode("ascii") + b'","objects":' + data + b',"type":"bundle"}'
+
+    def serialize(self, objects) -> bytes:
+        return self.bundle(objects)[1]
+
+
+def _orjson_default(value):
+    if isinstance(value, stix2.base._STIXBase):
+        # As stix2.base.STIXJSONEncoder, without the optional properties left to their default
+        data = dict(value)
+        for name in value._defaulted_optional_properties:
+            del data[name]
+        return data
+    if isinstance(value, stix2.utils.STIXdatetime) or hasattr(value, "isoformat"):
+        return stix2.utils.format_datetime(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class OrjsonBundleSerializer(JsonBundleSerializer):
+    """Serializes STIX bundles with orjson, same output as `JsonBundleSerializer`"""
+
+    name = "orjson"
+
+    def dumps(self, value) -> bytes:
+        return orjson.dumps(
+            value,
+            default=_orjson_default,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+
+
+def get_serializer(name="auto") -> JsonBundleSerializer:
+    """Returns the bundle serializer called `name` (`orjson`, `json` or `auto` for orjson when installed)
+
+    Raises:
+        ValueError: If the serializer is unknown or orjson is requested but not installed.
+    """
+    name = name.lower()
+    if name == "auto":
+        name = "json" if orjson is None else "orjson"
+    if name == "json":
+        return JsonBundleSerializer()
+    if name == "orjson":
+        if orjson is None:
+            raise ValueError("The orjson bundle serializer requires the orjson package")
+        return OrjsonBundleSerializer()
+    raise ValueError(f"Unknown bundle serializer '{name}'. It SHOULD be one of 'auto', 'orjson' or 'json'")
@@ -0,0 +1,112 @@
+import threading
+import time
+from datetime import datetime
+
+
+class RunCheckpoint:
+    """Progress of a run, saved in the connector state as the bundles are sent
+
+    A run that fails keeps its checkpoint in the state. The next run resumes it: it reuses the
+    timestamp of the interrupted run for the `created` and `modified` of the objects, and when its
+    inputs (datasets, techniques, shard) are the ones of the interrupted run it starts the generation
+    at `resume_from`, the position up to which every group was in a confirmed bundle. The bundles
+    that still come out the same (same content derived IDs) as ones already confirmed by OpenCTI are
+    skipped instead of being sent again. Bundles whose content changed in the meantime are simply sent.
+
+    Every bundle handed to the sender gets a sequence number (`queue()`) and the position of the
+    collection when it was cut. Bundles may be confirmed out of order (several sender threads):
+    `progress` only moves to the position of a bundle once all the bundles before it are confirmed.
+
+    Attributes:
+        started (int): Start of the run (epoch seconds), the one of the interrupted run when resuming.
+        timestamp (str): STIX timestamp of the objects of the run.
+        sent (list): IDs of the bundles confirmed so far, in order.
+        progress (dict): Position (i. e., source and incident) before which every group of the run is
+                         in a confirmed bundle.
+        resume_from (dict): `progress` of the interrupted run when resuming, empty otherwise.
+        inputs (str): Fingerprint of the inputs of the run, set by the connector.
+        resumed (bool): Whether the run resumes an interrupted one.
+        unsaved (int): Bundles confirmed since the checkpoint was last saved in the connector state.
+        saved_at (float): When the checkpoint was last saved (`time.monotonic()`).
+    """
+
+    def __init__(self, started, state=None):
+        """
+        Args:
+            started (int): Start of this run (epoch seconds).
+            state (dict): The `checkpoint` entry of the connector state, if any.
+        """
+        state = state or {}
+        self.resumed = "started" in state
+        self.started = state.get("started", started)
+        self.timestamp = state.get(
+            "timestamp", datetime.utcfromtimestamp(self.started).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        )
+        self.sent = list(state.get("sent", []))
+        self.progress = dict(state.get("progress", {}))
+        self.resume_from = dict(self.progress)
+        self.inputs = state.get("inputs")
+        self._sent = set(self.sent)
+        self.skipped = 0
+        self.unsaved = 0
+        self.saved_at = time.monotonic()
+        # Bundles are queued by the collection and confirmed by the sender threads
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._next = 0
+        self._confirmed = {}
+
+    def is_sent(self, bundle_id) -> bool:
+        """Whether a bundle was already confirmed (by this run or the interrupted one)"""
+        return bundle_id in self._sent
+
+    def queue(self) -> int:
+        """Returns the sequence number of the next bundle handed to the sender"""
+        with self._lock:
+            sequence = self._queued
+            self._queued += 1
+        return sequence
+
+    def confirm(self, bundle_id, sequence=None, progress=None) -> None:
+        """Records a bundle sent to OpenCTI (or skipped, already sent by the interrupted run)
+
+        Args:
+            bundle_id (str): ID of the bundle.
+            sequence (int): Sequence number of the bundle, see `queue()`.
+            progress (dict): Position of the collection when the bundle was cut: every group before it
+                             is in this bundle or in the ones queued before.
+        """
+        with self._lock:
+            if bundle_id not in self._sent:
+                self._sent.add(bundle_id)
+                self.sent.append(bundle_id)
+                self.unsaved += 1
+            if sequence is None:
+                return
+            self._confirmed[sequence] = progress
+            while self._next in self._confirmed:
+                progress = self._confirmed.pop(self._next)
+                if progress:
+                    self.progress = dict(progress)
+                self._next += 1
+
+    def saved(self, state) -> None:
+        """Records that the checkpoint was saved in the connector state
+
+        Args:
+            state (dict): The `state()` that was saved.
+        """
+        with self._lock:
+            self.unsaved = len(self.sent) - len(state["sent"])
+            self.saved_at = time.monotonic()
+
+    def state(self) -> dict:
+        """Returns the `checkpoint` entry to store in the connector state"""
+        with self._lock:
+            return {
+                "started": self.started,
+                "timestamp": self.timestamp,
+                "sent": list(self.sent),
+                "progress": dict(self.progress),
+                "inputs": self.inputs,
+            }
@@ -0,0 +1,16 @@
+INTERVAL_UNITS = {"d": 60 * 60 * 24, "h": 60 * 60, "m": 60, "s": 1}
+
+
+def parse_interval(interval) -> int:
+    """Converts an interval such as '7d', '12h', '10m' or '30s' into seconds
+
+    Raises:
+        ValueError: If the interval is not a number followed by one of 'd', 'h', 'm', 's'.
+    """
+    interval = str(interval).strip().lower()
+    unit = interval[-1:]
+    if unit not in INTERVAL_UNITS:
+        raise ValueError(
+            f"Invalid interval '{interval}'. It SHOULD be a string in the format '7d', '12h', '10m', '30s'"
+        )
+    return int(interval[:-1]) * INTERVAL_UNITS[unit]
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+
+from lib.delta import file_hash
+
+# Version of the parsed content, part of the key of the entries: bump it when the parsing of a
+# format changes, so that the entries parsed the old way are not used any more
+CACHE_VERSION = 2
+
+
+class DatasetCache:
+    """Local cache of parsed dataset files
+
+    The content parsed from a source file is stored in binary columnar form next to a manifest with
+    the size, modification time and SHA-256 of the file it comes from. On later runs it is loaded
+    from the cache as long as the file did not change, without parsing the source again. If only
+    the modification time changed, the content hash decides.
+
+    Parsed content is a dict whose values can be dataframes (stored as pickles), numpy arrays
+    (stored as .npy files and memory-mapped when loaded) or small JSON values (kept in the manifest).
+
+    Attributes:
+        cache_dir (str): Directory holding one entry per source file.
+        hit (bool): Whether the last `get` was served from the cache.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hit = False
+
+    def _entry_dir(self, path, variant=None) -> str:
+        key = f"{os.path.abspath(path)}|v{CACHE_VERSION}"
+        if variant:
+            key += "|" + json.dumps(variant, sort_keys=True)
+        key = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, "datasets", key)
+
+    @staticmethod
+    def _read_manifest(entry_dir):
+        try:
+            with open(os.path.join(entry_dir, "manifest.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_manifest(entry_dir, manifest):
+        tmp_path = os.path.join(entry_dir, "manifest.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(entry_dir, "manifest.json"))
+
+    def _is_fresh(self, entry_dir, manifest, path, stat) -> bool:
+        if manifest is None or "entries" not in manifest:
+            return False
+        if manifest["path"] != os.path.abspath(path) or manifest["size"] != stat.st_size:
+            return False
+        if manifest["mtime"] == stat.st_mtime_ns:
+            return True
+        # Touched but maybe not modified
+        if manifest["sha256"] != file_hash(path):
+            return False
+        manifest["mtime"] = stat.st_mtime_ns
+        self._write_manifest(entry_dir, manifest)
+        return True
+
+    @staticmethod
+    def _load_entries(entry_dir, entries) -> dict:
+        # Only imported when a dataset is loaded, see `lib/sources.py`
+        import numpy as np
+        import pandas as pd
+
+        content = {}
+        for name, entry in entries.items():
+            if entry == "frame":
+                content[name] = pd.read_pickle(os.path.join(entry_dir, f"{name}.pkl"))
+            elif entry == "array":
+                content[name] = np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode="r")
+            else:
+                content[name] = entry["value"]
+        return content
+
+    @staticmethod
+    def _store_entries(entry_dir, content) -> dict:
+        import numpy as np
+        import pandas as pd
+
+        # Files are written aside and then renamed, as the previous ones may still be memory-mapped
+        entries = {}
+        for name, value in content.items():
+            if isinstance(value, pd.DataFrame):
+                file_path = os.path.join(entry_dir, f"{name}.pkl")
+                value.to_pickle(file_path + ".tmp", compression=None)
+                os.replace(file_path + ".tmp", file_path)
+                entries[name] = "frame"
+            elif isinstance(value, np.ndarray):
+                file_path = os.path.join(entry_dir, f"{name}.npy")
+                with open(file_path + ".tmp", "wb") as f:
+                    np.save(f, value, allow_pickle=False)
+                os.replace(file_path + ".tmp", file_path)
+                entries[name] = "array"
+            else:
+                entries[name] = {"value": value}
+        return entries
+
+    def get(self, path, parse, variant=None) -> dict:
+        """Returns the parsed content of a file, from the cache if the file did not change
+
+        Args:
+            path (str): The source file.
+            parse (callable): Called with the path on a cache miss, returns a dict of name -> dataframe,
+                              numpy array or JSON value.
+            variant (dict): Parsing options (i. e., a column mapping); each variant has its own entry.
+        """
+        entry_dir = self._entry_dir(path, variant)
+        stat = os.stat(path)
+        manifest = self._read_manifest(entry_dir)
+
+        if self._is_fresh(entry_dir, manifest, path, stat):
+            try:
+                content = self._load_entries(entry_dir, manifest["entries"])
+                self.hit = True
+                return content
+            except (OSError, ValueError):
+                pass
+
+        self.hit = False
+        content = parse(path)
+        os.makedirs(entry_dir, exist_ok=True)
+        entries = self._store_entries(entry_dir, content)
+        self._write_manifest(entry_dir, {
+            "path": os.path.abspath(path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "sha256": file_hash(path),
+            "entries": entries,
+        })
+        return content
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+
+
+def file_hash(path, block_size=1 << 20) -> str:
+    """Returns the SHA-256 of the content of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_hash(value) -> str:
+    """Returns a short (64 bits) hash of a JSON-like value such as an incident record"""
+    if isinstance(value, Mapping) and not isinstance(value, dict):
+        # i. e., a record of an `IncidentTable`, hashed as the dict it reads as
+        value = dict(value)
+    data = json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+
+
+# Version of the `delta` entry of the connector state, the incident hashes are in a local file since 2
+DELTA_VERSION = 2
+
+
+class DeltaTracker:
+    """Tracks which datasets and incidents changed since the last successful run
+
+    The hashes of the dataset files come from the connector state. The hashes of the incidents, one
+    per incident of every source, would make the state (re-uploaded to OpenCTI with every checkpoint)
+    grow with the datasets: they are kept in a local file instead, and the state only holds the hash
+    of that file. When the file is missing or is not the one of the state (i. e., a run wrote it but
+    failed to store its state), the incidents of the changed files are all considered changed.
+
+    The hashes seen during the run are kept apart and only become the new state (see `save()` and
+    `state()`) once the bundle has been sent, so a failed run is retried in full next time.
+
+    Attributes:
+        path (str): JSON file of the incident hashes.
+        files (dict): Source -> hash of the dataset file (and of the DISARM map) at the last successful run.
+        incidents (dict): Source -> set of the incident hashes at the last successful run.
+    """
+
+    def __init__(self, state=None, dependencies="", path="delta_incidents.json"):
+        """
+        Args:
+            state (dict): The `delta` entry of the connector state, if any.
+            dependencies (str): Hash of anything else the generated objects depend on (i. e., the
+                DISARM techniques map). When it changes every incident is considered changed.
+            path (str): JSON file of the incident hashes.
+        """
+        state = state or {}
+        self.path = path
+        self.dependencies = dependencies
+        if state.get("dependencies") != dependencies:
+            state = {}
+        self.files = dict(state.get("files", {}))
+        if state.get("version", 1) < DELTA_VERSION:
+            # The incident hashes of the previous versions are in the state, moved to the file on save
+            incidents = state.get("incidents", {})
+        else:
+            incidents = self._load(state.get("incidents_hash"))
+        self.incidents = {source: set(hashes) for source, hashes in incidents.items()}
+        self._files = {}
+        self._incidents = {}
+        self._saved_hash = None
+
+    def _load(self, expected_hash) -> dict:
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return {}
+        if expected_hash is None or hashlib.sha1(data).hexdigest()[:16] != expected_hash:
+            return {}
+        try:
+            return json.loads(data).get("incidents", {})
+        except ValueError:
+            return {}
+
+    def file_changed(self, source, path) -> bool:
+        """Whether the dataset file of a source changed since the last successful run"""
+        self._files[source] = file_hash(path)
+        return self.files.get(source) != self._files[source]
+
+    def changed_incidents(self, source, incidents):
+        """Returns the incidents of a source that were added or changed since the last successful run
+
+        A list, or a table of the same type when the incidents are an `IncidentTable`.
+        """
+        known = self.incidents.get(source, set())
+        seen = self._incidents.setdefault(source, set())
+        changed = []
+        for position, incident in enumerate(incidents):
+            incident_hash = content_hash(incident)
+            seen.add(incident_hash)
+            if incident_hash not in known:
+                changed.append(position)
+        if hasattr(incidents, "take"):
+            return incidents.take(changed)
+        return [incidents[position] for position in changed]
+
+    def reset(self, source) -> None:
+        """Forgets the hashes of a source, so that all its incidents are considered changed"""
+        self.files.pop(source, None)
+        self.incidents.pop(source, None)
+
+    def save(self) -> None:
+        """Writes the incident hashes of the run to their file, after a successful run"""
+        incidents = dict(self.incidents, **self._incidents)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        data = json.dumps({
+            "version": DELTA_VERSION,
+            "incidents": {source: sorted(hashes) for source, hashes in incidents.items()},
+        }, separators=(",", ":")).encode("utf-8")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+        self._saved_hash = hashlib.sha1(data).hexdigest()[:16]
+
+    def state(self) -> dict:
+        """Returns the `delta` entry to store in the connector state, once the hashes were saved"""
+        return {
+            "version": DELTA_VERSION,
+            "dependencies": self.dependencies,
+            "files": dict(self.files, **self._files),
+            "incidents_hash": self._saved_hash,
+        }
@@ -0,0 +1,57 @@
+import pandas as pd
+
+
+# Sheets of the DISARM master workbook used by the connector
+INCIDENTS_SHEET = "incidents"
+INCIDENT_TECHNIQUES_SHEET = "incidenttechniques"
+
+
+def _parse_workbook(xls_path, mapping=None) -> dict:
+    # Open the workbook once and parse only the needed sheets
+    mapping = mapping or {}
+    with pd.ExcelFile(xls_path) as xls:
+        return {
+            INCIDENTS_SHEET: pd.read_excel(xls, sheet_name=mapping.get(INCIDENTS_SHEET, INCIDENTS_SHEET)),
+            INCIDENT_TECHNIQUES_SHEET: pd.read_excel(
+                xls, sheet_name=mapping.get(INCIDENT_TECHNIQUES_SHEET, INCIDENT_TECHNIQUES_SHEET)
+            ),
+        }
+
+
+class DisarmWorkbook:
+    """Incidents of the DISARM master workbook with their techniques
+
+    Attributes:
+        incidents (list): One dict per row of the `incidents` sheet (disarm_id, name, objecttype, summary,
+                          year_started, attributions_seen, found_in_country, urls, notes, when_added,
+                          found_via, longname), with empty cells as None.
+        techniques_by_incident (dict): Incident `disarm_id` -> list of its technique IDs, as listed in
+                                       the `incidenttechniques` sheet (disarm_id, name, incident_id, technique_ids, summary).
+    """
+
+    def __init__(self, incidents_df, incident_techniques_df):
+        # Replace NaN or infinite values with None to make them JSON serializable
+        incidents_df = incidents_df.replace({float('inf'): None, float('-inf'): None}).astype(object)
+        self.incidents = incidents_df.where(pd.notnull(incidents_df), None).to_dict("records")
+
+        # Group the incidenttechniques sheet once instead of filtering it for every incident
+        incident_techniques_df = incident_techniques_df.dropna(subset=["incident_id", "technique_ids"])
+        self.techniques_by_incident = (
+            incident_techniques_df.groupby("incident_id", sort=False)["technique_ids"].agg(list).to_dict()
+        )
+
+
+def load_workbook(xls_path, cache=None, mapping=None) -> DisarmWorkbook:
+    """Loads the DISARM master workbook
+
+    Args:
+        xls_path (str): Path of the workbook.
+        cache (DatasetCache): If given, the parsed sheets are kept in this cache so that openpyxl is
+                              only used when the workbook changes.
+        mapping (dict): Sheet names that differ from the DISARM ones (i. e., {'incidents': 'Incidents 2024'}).
+    """
+    if cache is None:
+        sheets = _parse_workbook(xls_path, mapping)
+    else:
+        sheets = cache.get(xls_path, lambda path: _parse_workbook(path, mapping), variant=mapping)
+    return DisarmWorkbook(sheets[INCIDENTS_SHEET], sheets[INCIDENT_TECHNIQUES_SHEET])
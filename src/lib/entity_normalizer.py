@@ -0,0 +1,184 @@
+import uuid
+from collections import namedtuple
+from functools import lru_cache
+
+# ISO 3166-1 alpha-2 code of the countries, by canonical name
+COUNTRY_CODES = {
+    "Argentina": "AR",
+    "Armenia": "AM",
+    "Australia": "AU",
+    "Azerbaijan": "AZ",
+    "Bahrain": "BH",
+    "Belarus": "BY",
+    "Bolivia": "BO",
+    "Bosnia and Herzegovina": "BA",
+    "Brazil": "BR",
+    "Canada": "CA",
+    "Chile": "CL",
+    "China": "CN",
+    "Comoros": "KM",
+    "Ecuador": "EC",
+    "Estonia": "EE",
+    "France": "FR",
+    "Georgia": "GE",
+    "Germany": "DE",
+    "Guatemala": "GT",
+    "India": "IN",
+    "Iran": "IR",
+    "Israel": "IL",
+    "Italy": "IT",
+    "Ivory Coast": "CI",
+    "Kenya": "KE",
+    "Latvia": "LV",
+    "Libya": "LY",
+    "Lithuania": "LT",
+    "Madagascar": "MG",
+    "Mali": "ML",
+    "Mexico": "MX",
+    "Moldova": "MD",
+    "Mozambique": "MZ",
+    "Myanmar": "MM",
+    "Netherlands": "NL",
+    "Nigeria": "NG",
+    "North Macedonia": "MK",
+    "Philippines": "PH",
+    "Poland": "PL",
+    "Portugal": "PT",
+    "Qatar": "QA",
+    "Russia": "RU",
+    "Saudi Arabia": "SA",
+    "Serbia": "RS",
+    "Solomon Islands": "SB",
+    "Spain": "ES",
+    "Sweden": "SE",
+    "Syria": "SY",
+    "Taiwan": "TW",
+    "Togo": "TG",
+    "Tunisia": "TN",
+    "Turkey": "TR",
+    "Ukraine": "UA",
+    "United Kingdom": "GB",
+    "United States": "US",
+    "Venezuela": "VE",
+    "Zimbabwe": "ZW",
+}
+
+# Spellings found in the datasets (case-insensitive) -> canonical name, for the countries and regions
+COUNTRY_ALIASES = {
+    "us": "United States",
+    "usa": "United States",
+    "united-states": "United States",
+    "united states of america": "United States",
+    "uk": "United Kingdom",
+    "united-kingdom": "United Kingdom",
+    "great britain": "United Kingdom",
+    "eu": "European Union",
+    "russa": "Russia",
+    "russian federation": "Russia",
+    "bahrein": "Bahrain",
+    "saudiarabia": "Saudi Arabia",
+    "bosnia-herzegovina": "Bosnia and Herzegovina",
+    "macedonia": "North Macedonia",
+    "cote d'ivoire": "Ivory Coast",
+    "nagorno-karabagh": "Nagorno-Karabakh",
+}
+
+# Spellings of the threat actors that are not countries -> canonical name
+ACTOR_ALIASES = {
+    "ira": "IRA",
+}
+
+# Marks added to some values in the datasets (i. e., `IRA*` for a suspected attribution)
+ATTRIBUTION_MARKERS = "*"
+
+_COUNTRY_NAMES = {name.casefold(): name for name in COUNTRY_CODES}
+
+# Canonical name, STIX ID and ISO country code (None if not a country) of an entity
+Entity = namedtuple("Entity", ["name", "stix_id", "country_code"])
+
+
+def deterministic_id(namespace, stix_type, key) -> str:
+    """Returns the ID of an object of the run graph: uuid5 of its key in the connector namespace"""
+    return f"{stix_type}--{uuid.uuid5(namespace, key)}"
+
+
+def _clean(value) -> str:
+    return str(value).strip().rstrip(ATTRIBUTION_MARKERS).strip()
+
+
+def canonical_country(value) -> str:
+    """Canonical name of a country or region as written in a dataset (unknown names are only trimmed)"""
+    value = _clean(value)
+    folded = value.casefold()
+    return COUNTRY_ALIASES.get(folded) or _COUNTRY_NAMES.get(folded, value)
+
+
+def canonical_actor(value) -> str:
+    """Canonical name of a threat actor as written in a dataset (countries are named as locations)"""
+    value = _clean(value)
+    folded = value.casefold()
+    return ACTOR_ALIASES.get(folded) or COUNTRY_ALIASES.get(folded) or _COUNTRY_NAMES.get(folded, value)
+
+
+class EntityNormalizer:
+    """Canonical names and deterministic IDs of the countries and threat actors of the datasets
+
+    The datasets write the same entity in several ways (`USA`, `US`, `United-States`; `Kenya ` with
+    a trailing space; `IRA*` with an attribution marker), which would give as many entities. Values
+    are trimmed, stripped of the attribution markers and mapped through the alias tables, countries
+    also getting their ISO 3166-1 code. Both generators go through the normalizer, so the same
+    entity gets the same ID whatever the dataset.
+
+    Raw values, and the comma-separated fields they come from, repeat across thousands of incidents:
+    the canonical entity of each is kept in LRU memos of `memo_size` entries, so the uuid5 of an
+    entity is only computed once.
+
+    Attributes:
+        namespace (uuid.UUID): Namespace of the deterministic IDs.
+        memo_size (int): Raw values (and fields) remembered per kind of entity.
+    """
+
+    def __init__(self, namespace, memo_size=4096):
+        self.namespace = namespace
+        self.memo_size = memo_size
+        self.country = lru_cache(maxsize=memo_size)(self._country)
+        self.actor = lru_cache(maxsize=memo_size)(self._actor)
+        self.countries = lru_cache(maxsize=memo_size)(self._countries)
+        self.actors = lru_cache(maxsize=memo_size)(self._actors)
+
+    def _country(self, value):
+        """Entity of a country or region (None for an empty value)"""
+        name = canonical_country(value)
+        if not name:
+            return None
+        return Entity(name, deterministic_id(self.namespace, "location", name), COUNTRY_CODES.get(name))
+
+    def _actor(self, value):
+        """Entity of a threat actor (None for an empty value)"""
+        name = canonical_actor(value)
+        if not name:
+            return None
+        return Entity(name, deterministic_id(self.namespace, "threat-actor", name), COUNTRY_CODES.get(name))
+
+    def _countries(self, field) -> tuple:
+        """Entities of a comma-separated field of countries, without duplicates"""
+        # Empty cells are NaN (a float) in the incident tables
+        entities = (self.country(value) for value in field.split(",")) if isinstance(field, str) else ()
+        return tuple(dict.fromkeys(entity for entity in entities if entity is not None))
+
+    def _actors(self, field) -> tuple:
+        """Entities of a comma-separated field of threat actors, without duplicates"""
+        # Empty cells are NaN (a float) in the incident tables
+        entities = (self.actor(value) for value in field.split(",")) if isinstance(field, str) else ()
+        return tuple(dict.fromkeys(entity for entity in entities if entity is not None))
+
+    def log_summary(self, helper) -> None:
+        """Logs how many values went through the memos"""
+        lookups = [memo.cache_info() for memo in (self.country, self.actor, self.countries, self.actors)]
+        hits = sum(info.hits for info in lookups)
+        misses = sum(info.misses for info in lookups)
+        distinct = self.country.cache_info().currsize + self.actor.cache_info().currsize
+        helper.log_info(
+            f"Normalized {hits + misses} country and threat actor values and fields "
+            f"({hits} from the memo, {distinct} distinct raw values)"
+        )
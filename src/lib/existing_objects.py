@@ -0,0 +1,130 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+
+
+def _ids_filter(stix_ids) -> dict:
+    # `ids` matches the standard ID and the other STIX IDs of an entity: OpenCTI computes its own
+    # standard ID and keeps the IDs sent by the connector in `x_opencti_stix_ids`
+    return {
+        "mode": "and",
+        "filters": [{"key": "ids", "mode": "or", "values": list(stix_ids)}],
+        "filterGroups": [],
+    }
+
+
+def _reuse_connections(api, size) -> None:
+    """Lets `size` threads share the HTTP connections of the API client (10 by default in requests)"""
+    session = getattr(api, "session", None)
+    if session is None or size <= 10:
+        return
+    for prefix in ("http://", "https://"):
+        session.mount(prefix, HTTPAdapter(pool_connections=size, pool_maxsize=size))
+
+
+class ExistingObjectFilter:
+    """Drops from the groups of a run the objects that already exist in OpenCTI
+
+    Only useful when existing data is not updated: an object whose deterministic ID is already
+    in the platform would be ignored by the ingestion anyway. Groups are buffered until they hold
+    `buffer_objects` objects, then the IDs not looked up yet in the run are checked in batches of
+    `batch_size` (one paginated `ids` query each, domain objects and relationships apart),
+    `concurrency` queries at a time over the HTTP session of the API client.
+
+    When a lookup fails, the objects of the buffer are all kept, so the run sends what it would
+    have sent without the filter.
+
+    Attributes:
+        batch_size (int): IDs per query.
+        concurrency (int): Queries run at the same time.
+        buffer_objects (int): Objects generated before looking them up.
+        known (dict): STIX ID -> whether it exists in the platform, for the IDs looked up in the run.
+        skipped (int): Objects dropped because they already exist.
+        queries (int): Queries made.
+        seconds (float): Time spent in the lookups.
+    """
+
+    def __init__(self, helper, batch_size=500, concurrency=4, buffer_objects=5000):
+        self.helper = helper
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.buffer_objects = buffer_objects
+        self.known = {}
+        self.skipped = 0
+        self.queries = 0
+        self.seconds = 0.0
+        _reuse_connections(helper.api, concurrency)
+
+    def _query(self, kind, stix_ids) -> set:
+        """Returns the IDs of a batch (all domain objects or all relationships) that exist in the platform"""
+        if kind == "relationship":
+            entity = self.helper.api.stix_core_relationship
+        else:
+            entity = self.helper.api.stix_domain_object
+        existing = set()
+        after = None
+        while True:
+            self.queries += 1
+            result = entity.list(
+                filters=_ids_filter(stix_ids),
+                first=len(stix_ids),
+                after=after,
+                withPagination=True,
+                customAttributes="standard_id x_opencti_stix_ids",
+            )
+            for entity_data in result.get("entities") or []:
+                existing.add(entity_data["standard_id"])
+                existing.update(entity_data.get("x_opencti_stix_ids") or [])
+            pagination = result.get("pagination") or {}
+            if not pagination.get("hasNextPage"):
+                return existing
+            after = pagination.get("endCursor")
+
+    def lookup(self, pool, stix_ids) -> None:
+        """Looks up the IDs not known yet, adding them to `known`"""
+        new_ids = [stix_id for stix_id in dict.fromkeys(stix_ids) if stix_id not in self.known]
+        batches = []
+        for kind in ("domain-object", "relationship"):
+            ids = [stix_id for stix_id in new_ids if stix_id.startswith("relationship--") == (kind == "relationship")]
+            batches += [(kind, ids[start:start + self.batch_size]) for start in range(0, len(ids), self.batch_size)]
+        for (kind, ids), existing in zip(batches, pool.map(lambda batch: self._query(*batch), batches)):
+            for stix_id in ids:
+                self.known[stix_id] = stix_id in existing
+
+    def _flush(self, pool, buffer):
+        start = time.perf_counter()
+        try:
+            self.lookup(pool, [stix_object["id"] for group, _ in buffer for stix_object in group])
+            failed = False
+        except Exception as e:
+            self.helper.log_warning(f"Could not check which objects already exist in OpenCTI, sending them all: {str(e)}")
+            failed = True
+        self.seconds += time.perf_counter() - start
+        if failed:
+            yield from buffer
+            return
+        for group, tag in buffer:
+            new_objects = [stix_object for stix_object in group if not self.known.get(stix_object["id"])]
+            self.skipped += len(group) - len(new_objects)
+            if new_objects:
+                yield new_objects, tag
+
+    def filter(self, groups):
+        """Yields the groups without the objects that already exist in the platform
+
+        Args:
+            groups: (group, tag) pairs, the tag (i. e., the position of the group) being yielded along
+                    with the filtered group. Groups left empty are dropped.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            buffer = []
+            buffered = 0
+            for group, tag in groups:
+                buffer.append((group, tag))
+                buffered += len(group)
+                if buffered >= self.buffer_objects:
+                    yield from self._flush(pool, buffer)
+                    buffer = []
+                    buffered = 0
+            yield from self._flush(pool, buffer)
@@ -3,9 +3,17 @@ import sys
 import time
 from datetime import datetime
 
-import stix2
 from pycti import OpenCTIConnectorHelper
 
+from lib.bundle_chunker import BundleChunker
+from lib.bundle_sender import BundleSender
+from lib.bundle_serializer import get_serializer
+from lib.checkpoint import RunCheckpoint
+from lib.config import parse_interval
+from lib.existing_objects import ExistingObjectFilter
+from lib.file_watcher import create_watcher
+from lib.instrumentation import RunMetrics, RunProfiler
+
 
 class ExternalImportConnector:
     """Specific external-import connector
@@ -62,32 +70,299 @@ class ExternalImportConnector:
             self.helper.log_warning(msg)
             self.update_existing_data = "false"
 
-    def _collect_intelligence(self) -> list:
-        """Collect intelligence from the source"""
+        # Size limits of the bundles sent to OpenCTI (0 for no limit)
+        try:
+            self.bundle_max_objects = int(os.environ.get("CONNECTOR_BUNDLE_MAX_OBJECTS", 5000))
+            self.bundle_max_bytes = int(os.environ.get("CONNECTOR_BUNDLE_MAX_BYTES", 0))
+        except ValueError as ex:
+            msg = (
+                f"Error ({ex}) when grabbing CONNECTOR_BUNDLE_MAX_OBJECTS or CONNECTOR_BUNDLE_MAX_BYTES environment variables. "
+                "They SHOULD be integers. "
+            )
+            self.helper.log_error(msg)
+            raise ValueError(msg) from ex
+
+        bundle_serializer = os.environ.get("CONNECTOR_BUNDLE_SERIALIZER", "auto")
+        try:
+            self.bundle_serializer = get_serializer(bundle_serializer)
+        except ValueError as ex:
+            msg = f"Error when grabbing CONNECTOR_BUNDLE_SERIALIZER environment variable: '{bundle_serializer}'. {str(ex)}"
+            self.helper.log_error(msg)
+            raise ValueError(msg) from ex
+
+        # What starts a run: the interval only, or also a change of the watched datasets
+        self.trigger = os.environ.get("CONNECTOR_TRIGGER", "interval").lower()
+        if self.trigger not in ["interval", "watch", "poll"]:
+            msg = (
+                f"Error when grabbing CONNECTOR_TRIGGER environment variable: '{self.trigger}'. "
+                "It SHOULD be one of 'interval', 'watch' or 'poll'. "
+            )
+            self.helper.log_error(msg)
+            raise ValueError(msg)
+        watch_debounce = os.environ.get("CONNECTOR_WATCH_DEBOUNCE", "5s")
+        watch_poll_interval = os.environ.get("CONNECTOR_WATCH_POLL_INTERVAL", "10s")
+        try:
+            self.watch_debounce = parse_interval(watch_debounce)
+            self.watch_poll_interval = parse_interval(watch_poll_interval)
+        except ValueError as ex:
+            msg = (
+                f"Error when grabbing CONNECTOR_WATCH_DEBOUNCE or CONNECTOR_WATCH_POLL_INTERVAL environment variables: "
+                f"'{watch_debounce}', '{watch_poll_interval}'. {str(ex)}"
+            )
+            self.helper.log_error(msg)
+            raise ValueError(msg) from ex
+        self.watcher = None
+        # Watched files whose change started the run, kept until a run succeeds
+        self.changed_paths = set()
+        self.checkpoint = None
+        self._bundle_progress = {}
+        # Local copy of the schedule (see `lib/run_marker.py`), set by the connectors that keep one
+        self.run_marker = None
+
+        # Drop the objects already in OpenCTI before sending the bundles (only when existing data is not updated)
+        self.precheck_existing = os.environ.get("CONNECTOR_PRECHECK_EXISTING", "false").lower() == "true"
+        try:
+            self.precheck_batch_size = int(os.environ.get("CONNECTOR_PRECHECK_BATCH_SIZE", 500))
+            self.precheck_concurrency = int(os.environ.get("CONNECTOR_PRECHECK_CONCURRENCY", 4))
+        except ValueError as ex:
+            msg = (
+                f"Error ({ex}) when grabbing CONNECTOR_PRECHECK_BATCH_SIZE or CONNECTOR_PRECHECK_CONCURRENCY environment variables. "
+                "They SHOULD be integers. "
+            )
+            self.helper.log_error(msg)
+            raise ValueError(msg) from ex
+        if self.precheck_existing and self.update_existing_data is True:
+            self.helper.log_warning(
+                "CONNECTOR_PRECHECK_EXISTING is ignored since CONNECTOR_UPDATE_EXISTING_DATA is true: existing objects are sent to be updated"
+            )
+            self.precheck_existing = False
+
+        # Bundles are sent by background threads while the next ones are generated (0 to send them in turn)
+        try:
+            self.send_workers = int(os.environ.get("CONNECTOR_SEND_WORKERS", 1))
+            self.send_queue_size = int(os.environ.get("CONNECTOR_SEND_QUEUE_SIZE", 4))
+            self.send_retries = int(os.environ.get("CONNECTOR_SEND_RETRIES", 3))
+            self.send_retry_backoff = float(os.environ.get("CONNECTOR_SEND_RETRY_BACKOFF", 1))
+        except ValueError as ex:
+            msg = (
+                f"Error ({ex}) when grabbing CONNECTOR_SEND_WORKERS, CONNECTOR_SEND_QUEUE_SIZE, CONNECTOR_SEND_RETRIES "
+                "or CONNECTOR_SEND_RETRY_BACKOFF environment variables. They SHOULD be numbers. "
+            )
+            self.helper.log_error(msg)
+            raise ValueError(msg) from ex
+        self.bundle_sender = None
+
+        # The checkpoint is saved in the connector state (a round-trip to OpenCTI) every so many
+        # bundles confirmed or seconds, and once the bundles are all sent
+        try:
+            self.checkpoint_bundles = int(os.environ.get("CONNECTOR_CHECKPOINT_BUNDLES", 10))
+            self.checkpoint_seconds = float(os.environ.get("CONNECTOR_CHECKPOINT_SECONDS", 30))
+        except ValueError as ex:
+            msg = (
+                f"Error ({ex}) when grabbing CONNECTOR_CHECKPOINT_BUNDLES or CONNECTOR_CHECKPOINT_SECONDS environment variables. "
+                "They SHOULD be numbers. "
+            )
+            self.helper.log_error(msg)
+            raise ValueError(msg) from ex
+
+        # Optional profile of the first run (cprofile or tracemalloc), written to CONNECTOR_PROFILE_DIR
+        profile = os.environ.get("CONNECTOR_PROFILE", "").lower()
+        self.profiler = None
+        if profile:
+            try:
+                self.profiler = RunProfiler(profile, os.environ.get("CONNECTOR_PROFILE_DIR", "profiles"))
+            except ValueError as ex:
+                msg = f"Error when grabbing CONNECTOR_PROFILE environment variable: '{profile}'. {str(ex)}"
+                self.helper.log_error(msg)
+                raise ValueError(msg) from ex
+        self.metrics = RunMetrics()
+
+    def _collect_intelligence(self):
+        """Collect intelligence from the source
+
+        Returns either a list of STIX objects, which is sent as a single bundle, or an iterable
+        of groups (lists) of STIX objects, which are packed into bundles of bounded size. Objects
+        that refer to each other SHOULD be yielded in the same group.
+        """
         raise NotImplementedError
 
+    def _send_bundle(self, bundle_objects, work_id) -> None:
+        """Serializes a list of STIX objects into one bundle and hands it to the sender
+
+        With a checkpoint, bundles already confirmed by an interrupted run are skipped. The checkpoint
+        is saved here when it is due, so this thread is the only one writing the connector state and
+        the senders never wait for it.
+        """
+        self._save_checkpoint()
+        # The objects are already built (stix2 objects or plain STIX dicts), serialize them
+        # without going through stix2.Bundle, which would parse and validate them again
+        with self.metrics.stage("serialize"):
+            bundle_id, bundle = self.bundle_serializer.bundle(bundle_objects)
+        # The position of the group being added when the bundle is cut, not of the generation (which
+        # can be ahead, see `_collect_into_bundles`)
+        progress = self._bundle_progress
+        sequence = None
+        if self.checkpoint is not None:
+            sequence = self.checkpoint.queue()
+            if self.checkpoint.is_sent(bundle_id):
+                self.checkpoint.skipped += 1
+                self.checkpoint.confirm(bundle_id, sequence, progress)
+                self.helper.log_debug(f"{bundle_id} was already sent by the interrupted run, skipping it")
+                return
+        self.bundle_sender.submit((bundle_id, bundle, bundle_objects, work_id, sequence, progress))
+
+    def _push_bundle(self, queued_bundle) -> None:
+        """Sends a bundle to OpenCTI (called by the sender)"""
+        _, bundle, bundle_objects, work_id, _, _ = queued_bundle
+        self.helper.log_info(f"Sending {len(bundle_objects)} STIX objects to OpenCTI...")
+        self.helper.send_stix2_bundle(
+            bundle.decode("utf-8"),
+            update=self.update_existing_data,
+            work_id=work_id,
+        )
+
+    def _save_checkpoint(self, force=False) -> None:
+        """Saves the checkpoint in the connector state if bundles were confirmed since the last save
+
+        Unless `force`, only once `checkpoint_bundles` bundles were confirmed or `checkpoint_seconds`
+        went by since the last save: a run that fails resends at most the bundles confirmed since.
+        """
+        checkpoint = self.checkpoint
+        if checkpoint is None or not checkpoint.unsaved:
+            return
+        if not force and checkpoint.unsaved < self.checkpoint_bundles and time.monotonic() - checkpoint.saved_at < self.checkpoint_seconds:
+            return
+        with self.metrics.stage("checkpoint"):
+            saved = checkpoint.state()
+            current_state = self.helper.get_state() or {}
+            current_state["checkpoint"] = saved
+            self.helper.set_state(current_state)
+        # Bundles confirmed by the senders meanwhile are left for the next save
+        checkpoint.saved(saved)
+
+    def _bundle_sent(self, queued_bundle, seconds, attempts, queue_depth) -> None:
+        """Records a bundle sent (called by the sender, one bundle at a time)
+
+        With a checkpoint, the bundle is only confirmed in it: the checkpoint is saved by the thread
+        collecting the bundles (see `_send_bundle`).
+        """
+        bundle_id, bundle, bundle_objects, _, sequence, progress = queued_bundle
+        self.metrics.add_stage("send", seconds)
+        self.metrics.add_send(seconds, attempts, queue_depth)
+        self.metrics.add_bundle(bundle_objects, len(bundle))
+        self.helper.metric.inc("record_send", len(bundle_objects))
+        if self.checkpoint is not None:
+            self.checkpoint.confirm(bundle_id, sequence, progress)
+
+    def _collect_and_send(self, work_id) -> BundleChunker:
+        """Collects the intelligence and sends it in bundles, returns the chunker used"""
+        self.bundle_sender = BundleSender(
+            self._push_bundle,
+            self._bundle_sent,
+            self.send_workers,
+            self.send_queue_size,
+            self.send_retries,
+            self.send_retry_backoff,
+        )
+        try:
+            chunker = self._collect_into_bundles(work_id)
+        except Exception:
+            # The bundles already generated are still sent, the next run has less to resume
+            self.bundle_sender.close(raise_error=False)
+            raise
+        else:
+            self.bundle_sender.close()
+        finally:
+            # Time the generation waited for the senders (full queue, then the last bundles)
+            self.metrics.add_stage("send_wait", self.bundle_sender.wait_seconds)
+            # The senders are stopped, the bundles confirmed since the last save are saved
+            self._save_checkpoint(force=True)
+        return chunker
+
+    def _collect_into_bundles(self, work_id) -> BundleChunker:
+        """Collects the intelligence and packs it into bundles for the sender, returns the chunker used"""
+        bundle_objects = self._collect_intelligence()
+        self._bundle_progress = self._progress()
+        if isinstance(bundle_objects, list):
+            # A plain list is sent as it is, in a single bundle
+            chunker = BundleChunker(lambda objects: self._send_bundle(objects, work_id))
+            chunker.add(bundle_objects)
+        else:
+            chunker = BundleChunker(
+                lambda objects: self._send_bundle(objects, work_id),
+                self.bundle_max_objects,
+                self.bundle_max_bytes,
+                self.bundle_serializer.object_size,
+            )
+            # Each group with the position of the collection when it comes out: the groups before it
+            # are all in the chunker, even if the precheck buffered the generation ahead
+            groups = ((group, self._progress()) for group in bundle_objects)
+            existing_filter = None
+            if self.precheck_existing:
+                existing_filter = ExistingObjectFilter(
+                    self.helper, self.precheck_batch_size, self.precheck_concurrency, self.bundle_max_objects or 5000
+                )
+                groups = existing_filter.filter(groups)
+            for group, progress in groups:
+                # A bundle cut while adding the group holds the groups before it
+                self._bundle_progress = progress
+                chunker.add(group)
+            self._bundle_progress = self._progress()
+            if existing_filter is not None:
+                self.metrics.add_stage("precheck", existing_filter.seconds)
+                self.helper.log_info(
+                    f"{existing_filter.skipped} STIX objects already in OpenCTI were not sent "
+                    f"({len(existing_filter.known)} IDs checked in {existing_filter.queries} queries)"
+                )
+        chunker.flush()
+        return chunker
+
+    def _run_state(self) -> dict:
+        """Entries to store in the connector state once the run has been sent successfully"""
+        return {}
+
+    def _progress(self) -> dict:
+        """Position of the collection (i. e., source and incident) when it yields a group, saved with
+        the bundles sent: a run resumed from it starts with this group"""
+        return {}
+
+    def _watch_paths(self) -> list:
+        """Files whose changes start a run when CONNECTOR_TRIGGER is `watch` or `poll`"""
+        return []
+
+    def _start_watcher(self) -> None:
+        if self.trigger == "interval":
+            return
+        paths = self._watch_paths()
+        if not paths:
+            self.helper.log_warning("No files to watch, the connector is only run every CONNECTOR_RUN_EVERY")
+            return
+        self.watcher = create_watcher(
+            paths, self.trigger, self.watch_debounce, self.watch_poll_interval, self.helper
+        )
+        self.helper.log_info(f"Watching {len(paths)} files ({self.watcher.name}) to start the runs")
+
+    def _wait_next_run(self, last_run) -> set:
+        """Waits until the next check, returns the watched files (absolute paths) that changed in the meantime"""
+        if self.watcher is None:
+            time.sleep(60)
+            return set()
+
+        # Wait for a change of the datasets, at most until the next scheduled run (a failed run is
+        # retried after 60s, as in the interval mode)
+        timeout = 60 if last_run is None else self._get_interval() - (int(time.time()) - last_run)
+        changed = self.watcher.wait(timeout if timeout > 0 else 60)
+        if changed:
+            self.helper.log_info(f"{', '.join(sorted(changed))} changed, starting a run")
+        return changed
+
     def _get_interval(self) -> int:
         """Returns the interval to use for the connector
 
-        This SHOULD always return the interval in seconds. If the connector expects
-        the parameter to be received as hours uncomment as necessary.
+        This SHOULD always return the interval in seconds.
         """
-        unit = self.interval[-1:]
-        value = self.interval[:-1]
-
         try:
-            if unit == "d":
-                # In days:
-                return int(value) * 60 * 60 * 24
-            if unit == "h":
-                # In hours:
-                return int(value) * 60 * 60
-            if unit == "m":
-                # In minutes:
-                return int(value) * 60
-            if unit == "s":
-                # In seconds:
-                return int(value)
+            return parse_interval(self.interval)
         except Exception as ex:
             self.helper.log_error(
                 f"Error when converting CONNECTOR_RUN_EVERY environment variable: '{self.interval}'. {str(ex)}"
@@ -99,6 +374,9 @@ class ExternalImportConnector:
     def run(self) -> None:
         # Main procedure
         self.helper.log_info(f"Starting {self.helper.connect_name} connector...")
+        self._start_watcher()
+        last_run = None
+        changed = set()
         while True:
             try:
                 # Get the current timestamp and check
@@ -116,54 +394,92 @@ class ExternalImportConnector:
                         f"{self.helper.connect_name} connector has never run"
                     )
 
-                # If the last_run is more than interval-1 day
-                if last_run is None or ((timestamp - last_run) >= self._get_interval()):
+                # A run interrupted before the end is resumed from its checkpoint
+                checkpoint = (current_state or {}).get("checkpoint")
+
+                # If the last_run is more than interval-1 day, or a watched dataset changed
+                if checkpoint or changed or last_run is None or ((timestamp - last_run) >= self._get_interval()):
                     self.helper.metric.inc("run_count")
                     self.helper.metric.state("running")
                     self.helper.log_info(f"{self.helper.connect_name} will run!")
+                    self.changed_paths |= changed
+                    self.checkpoint = RunCheckpoint(timestamp, checkpoint)
+                    if self.run_marker is not None:
+                        self.run_marker.started()
+                    if self.checkpoint.resumed:
+                        self.helper.log_info(
+                            f"Resuming the run started at "
+                            f'{datetime.utcfromtimestamp(self.checkpoint.started).strftime("%Y-%m-%d %H:%M:%S")}: '
+                            f"{len(self.checkpoint.sent)} bundles already sent (up to {self.checkpoint.progress})"
+                        )
                     now = datetime.utcfromtimestamp(timestamp)
                     friendly_name = f'{self.helper.connect_name} run @ {now.strftime("%Y-%m-%d %H:%M:%S")}'
                     work_id = self.helper.api.work.initiate_work(
                         self.helper.connect_id, friendly_name
                     )
 
+                    self.metrics = RunMetrics()
                     try:
                         # Performing the collection of intelligence
-                        bundle_objects = self._collect_intelligence()
-                        bundle = stix2.Bundle(
-                            objects=bundle_objects, allow_custom=True
-                        ).serialize()
+                        if self.profiler is not None:
+                            # Only one run is profiled
+                            profiler, self.profiler = self.profiler, None
+                            with profiler.profile(f"run-{timestamp}"):
+                                chunker = self._collect_and_send(work_id)
+                            self.helper.log_info(f"Profile of the run written to {profiler.directory}")
+                        else:
+                            chunker = self._collect_and_send(work_id)
 
-                        self.helper.log_info(
-                            f"Sending {len(bundle_objects)} STIX objects to OpenCTI..."
-                        )
-                        self.helper.send_stix2_bundle(
-                            bundle,
-                            update=self.update_existing_data,
-                            work_id=work_id,
-                        )
+                        if chunker.bundles:
+                            self.helper.log_info(
+                                f"{chunker.objects} STIX objects sent to OpenCTI in {chunker.bundles} bundles"
+                                + (f" ({self.checkpoint.skipped} of them already sent by the interrupted run)" if self.checkpoint.skipped else "")
+                            )
+                        else:
+                            self.helper.log_info("Nothing new to send to OpenCTI")
+                        run_state = self._run_state()
 
                     except Exception as e:
+                        # The checkpoint stays in the state, the next run resumes from the last bundle sent
                         self.helper.log_error(str(e))
+                        message = (
+                            f"{self.helper.connect_name} connector failed after sending "
+                            f"{len(self.checkpoint.sent)} bundles, the next run will resume it"
+                        )
+                        self.helper.log_error(message)
+                        self.helper.metric.inc("error_count")
+                        self.helper.api.work.to_processed(work_id, message, in_error=True)
+                        self.checkpoint = None
+                        self.metrics.log_summary(self.helper)
+                    else:
+                        self.metrics.log_summary(self.helper)
 
-                    # Store the current timestamp as a last run
-                    message = f"{self.helper.connect_name} connector successfully run, storing last_run as {timestamp}"
-                    self.helper.log_info(message)
+                        # Store the current timestamp as a last run
+                        message = f"{self.helper.connect_name} connector successfully run, storing last_run as {timestamp}"
+                        self.helper.log_info(message)
 
-                    self.helper.log_debug(
-                        f"Grabbing current state and update it with last_run: {timestamp}"
-                    )
-                    current_state = self.helper.get_state()
-                    if current_state:
-                        current_state["last_run"] = timestamp
-                    else:
-                        current_state = {"last_run": timestamp}
-                    self.helper.set_state(current_state)
+                        self.helper.log_debug(
+                            f"Grabbing current state and update it with last_run: {timestamp}"
+                        )
+                        current_state = self.helper.get_state()
+                        if current_state:
+                            current_state["last_run"] = timestamp
+                        else:
+                            current_state = {"last_run": timestamp}
+                        current_state.pop("checkpoint", None)
+                        if run_state:
+                            current_state.update(run_state)
+                        self.helper.set_state(current_state)
+                        last_run = timestamp
+                        self.checkpoint = None
+                        self.changed_paths = set()
+                        if self.run_marker is not None:
+                            self.run_marker.succeeded(timestamp, self._watch_paths())
 
-                    self.helper.api.work.to_processed(work_id, message)
-                    self.helper.log_info(
-                        f"Last_run stored, next run in: {round(self._get_interval() / 60 / 60, 2)} hours"
-                    )
+                        self.helper.api.work.to_processed(work_id, message)
+                        self.helper.log_info(
+                            f"Last_run stored, next run in: {round(self._get_interval() / 60 / 60, 2)} hours"
+                        )
                 else:
                     self.helper.metric.state("idle")
                     new_interval = self._get_interval() - (timestamp - last_run)
@@ -184,4 +500,4 @@ class ExternalImportConnector:
                 self.helper.log_info(f"{self.helper.connect_name} connector ended")
                 sys.exit(0)
 
-            time.sleep(60)
+            changed = self._wait_next_run(last_run)
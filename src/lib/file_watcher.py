@@ -0,0 +1,173 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+# inotify constants (see <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# struct inotify_event: wd, mask, cookie, len, followed by the (null padded) name
+_EVENT = struct.Struct("iIII")
+
+
+class FileWatcher:
+    """Waits for changes of a set of files
+
+    Bursts of changes (i. e., a dataset being copied in several writes) are debounced: once a change
+    is seen, the watcher keeps collecting changes until the files have been quiet for `debounce`
+    seconds, so a run starts once the files are complete.
+
+    Attributes:
+        paths (set): Absolute paths of the watched files.
+        debounce (float): Seconds without changes before reporting them.
+    """
+
+    name = None
+
+    def __init__(self, paths, debounce=5):
+        self.paths = {os.path.abspath(path) for path in paths}
+        self.debounce = debounce
+
+    def _changes(self, timeout) -> set:
+        """Returns the files changed within `timeout` seconds (as soon as there is one)"""
+        raise NotImplementedError
+
+    def wait(self, timeout) -> set:
+        """Waits for changes for at most `timeout` seconds
+
+        Returns:
+            set: The changed files, empty if nothing changed before the timeout.
+        """
+        deadline = time.monotonic() + max(timeout, 0)
+        changed = self._changes(max(deadline - time.monotonic(), 0))
+        while changed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            more = self._changes(min(self.debounce, remaining))
+            if not more:
+                break
+            changed |= more
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher(FileWatcher):
+    """Watches the files with Linux inotify (through ctypes)
+
+    The directories of the files are watched rather than the files themselves, so files replaced
+    by a rename or created after the watcher are also seen.
+
+    Raises:
+        OSError: If inotify is not available.
+    """
+
+    name = "inotify"
+
+    def __init__(self, paths, debounce=5):
+        super().__init__(paths, debounce)
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("The C library was not found")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available on this platform")
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1 failed: {os.strerror(errno)}")
+        self._directories = {}
+        for directory in sorted({os.path.dirname(path) for path in self.paths}):
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                self.close()
+                raise OSError(errno, f"inotify_add_watch failed on {directory}: {os.strerror(errno)}")
+            self._directories[wd] = directory
+
+    def _read(self) -> set:
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, _mask, _cookie, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                path = os.path.join(self._directories.get(wd, ""), os.fsdecode(name))
+                if path in self.paths:
+                    changed.add(path)
+
+    def _changes(self, timeout) -> set:
+        deadline = time.monotonic() + timeout
+        while True:
+            ready, _, _ = select.select([self.fd], [], [], max(deadline - time.monotonic(), 0))
+            if not ready:
+                return set()
+            # Events on other files of the directories are ignored
+            changed = self._read()
+            if changed or time.monotonic() >= deadline:
+                return changed
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher(FileWatcher):
+    """Watches the files by comparing their size and modification time every `poll_interval` seconds"""
+
+    name = "poll"
+
+    def __init__(self, paths, debounce=5, poll_interval=10):
+        super().__init__(paths, debounce)
+        self.poll_interval = poll_interval
+        self._snapshot = self._stat()
+
+    def _stat(self) -> dict:
+        snapshot = {}
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                snapshot[path] = None
+        return snapshot
+
+    def _changes(self, timeout) -> set:
+        deadline = time.monotonic() + timeout
+        while True:
+            time.sleep(max(min(self.poll_interval, deadline - time.monotonic()), 0))
+            snapshot = self._stat()
+            changed = {path for path in self.paths if snapshot[path] != self._snapshot[path]}
+            self._snapshot = snapshot
+            if changed or time.monotonic() >= deadline:
+                return changed
+
+
+def create_watcher(paths, mode="watch", debounce=5, poll_interval=10, helper=None) -> FileWatcher:
+    """Returns the watcher of a trigger mode: `watch` (inotify, polling when not available) or `poll`"""
+    if mode == "watch":
+        try:
+            return InotifyWatcher(paths, debounce)
+        except OSError as ex:
+            if helper is not None:
+                helper.log_warning(f"inotify is not available ({ex}), polling the datasets instead")
+    return PollingWatcher(paths, debounce, poll_interval)
@@ -0,0 +1,171 @@
+# STIX generators of the datasets.
+#
+# Each generator turns one incident record into the list of STIX objects (the group) that has to be sent
+# together: the intrusion set representing the incident, its actors and locations, and the relationships
+# between them and with the DISARM techniques. They only depend on their arguments, so they can run in
+# worker processes (see `lib/scheduler.py`). Countries and threat actors are canonicalized by the normalizer
+# of the graph (see `lib/entity_normalizer.py`).
+
+
+def margotfulde_intrusion_set_key(incident) -> str:
+    """Key of the intrusion set of an incident of a Fulde-format dataset"""
+    return incident['event']
+
+
+def disarm_intrusion_set_key(row) -> str:
+    """Key of the intrusion set of an incident of the DISARM workbook"""
+    return row['disarm_id']
+
+
+def margotfulde_shared_entities(incident, graph) -> tuple:
+    """Locations and threat actors of an incident of a Fulde-format dataset, shared with other incidents"""
+    normalizer = graph.normalizer
+    country_objects = [graph.location(country) for country in normalizer.countries(incident['target_country'])]
+
+    # Create the actor object (separated by commas or not present)
+    actors = normalizer.actors(incident['threat_actor']) or [normalizer.actor('Unknown')]
+    actor_objects = [graph.threat_actor(actor) for actor in actors]
+    return country_objects, actor_objects
+
+
+def margotfulde_incident_objects(incident, resolver, graph) -> list:
+    """STIX objects of an incident of a Fulde-format dataset (see `lib/margot_dataset_importer.py`)"""
+    stix_objects = []
+    country_objects, actor_objects = margotfulde_shared_entities(incident, graph)
+
+    # Get the techniques associated with this incident
+    technique_ids = []
+    for technique in incident['techniques']:
+        # Search in the DISARM index, the STIX ID of the technique to create the relationship
+        technique_id = resolver.resolve(technique)
+        if technique_id is None:
+            continue
+
+        technique_ids.append(technique_id)
+
+    # Create a campaign object to represent the incident (campaign is the closest object to an incident in STIX)
+    # Relate the campaign with the actors, locations and techniques.
+    intrusion_id = margotfulde_intrusion_set_key(incident)
+    intrusion_name = incident['event']
+    intrusion_description = incident['event_description']
+    intrusion_object = graph.intrusion_set(
+        intrusion_id,
+        intrusion_name,
+        intrusion_description,
+        ["incident", "disinformation","margotfulde"]
+    )
+
+    # Create the relationship between the used techniques and the incident
+    for technique in technique_ids:
+        relationship_technique = graph.relationship(intrusion_object["id"], "uses", technique)
+        stix_objects.append(relationship_technique)
+
+    # Create the relationship between the actors and the incident
+    for actor in actor_objects:
+        relationship_actor = graph.relationship(intrusion_object["id"], "attributed-to", actor["id"])
+        stix_objects.append(relationship_actor)
+
+    # Create the relationship between the locations and the incident
+    for country in country_objects:
+        relationship_country = graph.relationship(intrusion_object["id"], "targets", country["id"])
+        stix_objects.append(relationship_country)
+
+    stix_objects.append(intrusion_object)
+    stix_objects.extend(actor_objects)
+    stix_objects.extend(country_objects)
+    return stix_objects
+
+
+def disarm_shared_entities(row, graph) -> tuple:
+    """Locations and threat actors of an incident of the DISARM workbook, shared with other incidents"""
+    normalizer = graph.normalizer
+    # Create the targeted country object (separated by commas)
+    country_objects = [graph.location(country) for country in normalizer.countries(row['found_in_country'])]
+
+    # Create the actor object (separated by commas or not present)
+    actors = normalizer.actors(row['attributions_seen']) or [normalizer.actor('Unknown')]
+    actor_objects = [graph.threat_actor(actor) for actor in actors]
+    return country_objects, actor_objects
+
+
+def disarm_incident_objects(row, resolver, graph) -> list:
+    """STIX objects of an incident of the DISARM workbook (see `lib/disarm_workbook.py`)
+
+    The row holds the columns of the `incidents` sheet plus the `technique_ids` of the incident
+    taken from the `incidenttechniques` sheet.
+    """
+    stix_objects = []
+    # Now for this incident we also can get the techniques associated to this incident ID in the incidenttechniques sheet and create relationships to the threat actor (country):
+    # incidentstechniques sheet header: disarm_id, name, incident_id, technique_ids, summary
+    # Now lets apply SJ Terp's logic to create the STIX objects: https://x.com/bodaceacat/status/1189525720609050625
+    # Create the targeted country and actor objects
+    country_objects, actor_objects = disarm_shared_entities(row, graph)
+
+    # Get the techniques associated with this incident
+    technique_ids = []
+    for technique_disarm_id in row['technique_ids']:
+        # Search in the DISARM index, the STIX ID of the technique to create the relationship
+        # read from octi
+        # https://docs.opencti.io/5.8.X/development/connectors/#reading-from-the-opencti-platform
+        # https://docs.opencti.io/5.12.X/reference/filters/
+        # https://www.mickaelwalter.fr/opencti-use-the-api/
+        technique_id = resolver.resolve(technique_disarm_id)
+        if technique_id is None:
+            continue
+
+        technique_ids.append(technique_id)
+
+
+        # Create the relationship between the actors, locations and techniques
+        for actor_object in actor_objects:
+            relationship_actor = graph.relationship(actor_object["id"], "uses", technique_id)
+            stix_objects.append(relationship_actor)
+        for country in country_objects:
+            relationship_country = graph.relationship(technique_id, "targets", country["id"])
+            stix_objects.append(relationship_country)
+
+    # Create a campaign object to represent the incident (campaign is the closest object to an incident in STIX)
+    # Relate the campaign with the actors, locations and techniques.
+    intrusion_id = disarm_intrusion_set_key(row)
+    intrusion_name = row['name']
+    intrusion_description = row['summary']
+    intrusion_object = graph.intrusion_set(
+        intrusion_id,
+        intrusion_name,
+        intrusion_description,
+        ["incident", "disinformation","disarm"]
+    )
+
+
+    # Create the relationship between the used techniques and the incident
+    for technique in technique_ids:
+        relationship_technique = graph.relationship(intrusion_object["id"], "uses", technique)
+        stix_objects.append(relationship_technique)
+
+    # Create the relationship between the actors and the incident
+    for actor in actor_objects:
+        relationship_actor = graph.relationship(intrusion_object["id"], "attributed-to", actor["id"])
+        stix_objects.append(relationship_actor)
+
+    # Create the relationship between the locations and the incident
+    for country in country_objects:
+        relationship_country = graph.relationship(intrusion_object["id"], "targets", country["id"])
+        stix_objects.append(relationship_country)
+
+    stix_objects.append(intrusion_object)
+    stix_objects.extend(actor_objects)
+    stix_objects.extend(country_objects)
+    return stix_objects
+
+
+# Generator of each dataset format
+GENERATORS = {
+    "margotfulde": margotfulde_incident_objects,
+    "disarm": disarm_incident_objects,
+}
+
+# Key of the intrusion set representing an incident, for each generator (see `lib/sharding.py`)
+INTRUSION_SET_KEYS = {
+    "margotfulde": margotfulde_intrusion_set_key,
+    "disarm": disarm_intrusion_set_key,
+}
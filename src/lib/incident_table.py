@@ -0,0 +1,183 @@
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+
+def _csr(rows, values, n_rows):
+    """Returns the (indptr, values) of a (row, value) list sorted by row"""
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, values
+
+
+def _take_csr(indptr, values, indices):
+    """Returns the (indptr, values) of the rows `indices` of a CSR array"""
+    starts = indptr[indices]
+    lengths = indptr[indices + 1] - starts
+    new_indptr = np.zeros(len(indices) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_indptr[1:])
+    positions = np.repeat(starts - new_indptr[:-1], lengths) + np.arange(new_indptr[-1])
+    return new_indptr, values[positions]
+
+
+def _take_codes(codes, vocabulary, indices):
+    """Returns the (codes, vocabulary) of the rows `indices`, keeping only the values they use"""
+    used, inverse = np.unique(codes[indices], return_inverse=True)
+    has_na = len(used) > 0 and used[0] < 0
+    # Empty cells (-1) sort first, so they keep the code -1
+    new_codes = (inverse - 1 if has_na else inverse).astype(np.int32)
+    return new_codes, [vocabulary[code] for code in used.tolist() if code >= 0]
+
+
+class IncidentRecord(Mapping):
+    """Read-only view of an incident of an `IncidentTable`, used as the incident dict was"""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key):
+        return self._table.value(key, self._row)
+
+    def __iter__(self):
+        return iter(self._table.keys)
+
+    def __len__(self):
+        return len(self._table.keys)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def __reduce__(self):
+        # Pickled on its own (i. e., to a worker process) as a plain dict, not with its whole table
+        return dict, (dict(self),)
+
+
+class IncidentTable:
+    """Struct-of-arrays table of the incidents of a Fulde-format dataset
+
+    Every field column is stored as integer codes into a vocabulary of its distinct values, so the
+    few hundred actors, countries or regions of a dataset are only held once. Techniques, channels
+    and sources are stored in CSR form: one flat array of (technique/channel codes or source URLs)
+    and the offsets of the values of each incident.
+
+    The table is a sequence of `IncidentRecord`, which read as the incident dicts of `load_data`
+    did: year, target_country, event, region, sub_region, country_of_origin, threat_actor,
+    event_description, techniques, channels and sources. Slicing it (or `take()`) returns a table.
+
+    Attributes:
+        keys (list): The keys of the records.
+    """
+
+    def __init__(self, codes, vocabularies, techniques, technique_codes, channels, channel_columns, sources):
+        """
+        Args:
+            codes (dict): Field name -> int32 codes of the incidents (-1 for empty cells).
+            vocabularies (dict): Field name -> list of the distinct values of the field.
+            techniques (tuple): (indptr, int16 indices into `technique_codes`).
+            technique_codes (list): DISARM code of each technique column.
+            channels (tuple): (indptr, int16 indices into `channel_columns`).
+            channel_columns (list): Channel names.
+            sources (tuple): (indptr, object array of the sources).
+        """
+        self._codes = codes
+        self._vocabularies = vocabularies
+        self._techniques = techniques
+        self._technique_codes = technique_codes
+        self._channels = channels
+        self._channel_columns = channel_columns
+        self._sources = sources
+        self.keys = list(codes) + ['techniques', 'channels', 'sources']
+
+    @classmethod
+    def from_parsed(cls, parsed):
+        """Builds the table from the columnar parts returned by `parse_frame`"""
+        fields = parsed['fields']
+        n_rows = len(fields)
+
+        codes = {}
+        vocabularies = {}
+        for name in fields.columns:
+            field_codes, uniques = pd.factorize(fields[name], use_na_sentinel=True)
+            codes[name] = field_codes.astype(np.int32)
+            vocabularies[name] = list(uniques.tolist())
+
+        def flags_csr(packed, count):
+            rows, cols = np.nonzero(np.unpackbits(packed, axis=1, count=count))
+            return _csr(rows, cols.astype(np.int16), n_rows)
+
+        source_cells = parsed['sources'].to_numpy(dtype=object)
+        rows, cols = np.nonzero(pd.notna(source_cells))
+
+        return cls(
+            codes,
+            vocabularies,
+            flags_csr(parsed['techniques'], len(parsed['technique_codes'])),
+            list(parsed['technique_codes']),
+            flags_csr(parsed['channels'], len(parsed['channel_columns'])),
+            list(parsed['channel_columns']),
+            _csr(rows, source_cells[rows, cols], n_rows),
+        )
+
+    def __len__(self):
+        return len(self._techniques[0]) - 1
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield IncidentRecord(self, row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(np.arange(len(self))[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("incident index out of range")
+        return IncidentRecord(self, index)
+
+    def take(self, indices):
+        """Returns the table of the incidents at `indices`
+
+        The vocabularies of the new table only hold the values of its incidents, so a partition
+        pickled to a worker process does not carry the whole dataset.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        codes = {}
+        vocabularies = {}
+        for name, field_codes in self._codes.items():
+            codes[name], vocabularies[name] = _take_codes(field_codes, self._vocabularies[name], indices)
+        return IncidentTable(
+            codes,
+            vocabularies,
+            _take_csr(*self._techniques, indices),
+            self._technique_codes,
+            _take_csr(*self._channels, indices),
+            self._channel_columns,
+            _take_csr(*self._sources, indices),
+        )
+
+    def value(self, key, row):
+        """Returns the value of a key of the incident `row`"""
+        if key == 'techniques':
+            indptr, indices = self._techniques
+            return [self._technique_codes[i] for i in indices[indptr[row]:indptr[row + 1]].tolist()]
+        if key == 'channels':
+            indptr, indices = self._channels
+            return [self._channel_columns[i] for i in indices[indptr[row]:indptr[row + 1]].tolist()]
+        if key == 'sources':
+            indptr, values = self._sources
+            return values[indptr[row]:indptr[row + 1]].tolist()
+        code = self._codes[key][row]
+        return self._vocabularies[key][code] if code >= 0 else np.nan
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the table (arrays and vocabularies, sources included)"""
+        arrays = list(self._codes.values()) + list(self._techniques) + list(self._channels) + [self._sources[0]]
+        size = sum(array.nbytes for array in arrays)
+        size += self._sources[1].nbytes + sum(len(str(source)) + 49 for source in self._sources[1])
+        size += sum(len(str(value)) + 49 for vocabulary in self._vocabularies.values() for value in vocabulary)
+        return size
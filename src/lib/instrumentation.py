@@ -0,0 +1,227 @@
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows, the peak memory is not reported there
+    resource = None
+
+try:
+    import prometheus_client
+except ImportError:  # installed with pycti, only missing outside of the connector image
+    prometheus_client = None
+
+
+# Prometheus metrics of the stages, registered once per process in the default registry, which is
+# the one exposed by the helper when the metrics of the connector are enabled
+_PROMETHEUS_METRICS = {}
+
+
+def _prometheus_metrics() -> dict:
+    if prometheus_client is None:
+        return {}
+    if not _PROMETHEUS_METRICS:
+        _PROMETHEUS_METRICS.update({
+            "stage_seconds": prometheus_client.Counter(
+                "disinfo_stage_seconds", "Time spent in each stage of the runs", ["stage"]
+            ),
+            "last_stage_seconds": prometheus_client.Gauge(
+                "disinfo_last_stage_seconds", "Time spent in each stage of the last run", ["stage"]
+            ),
+            "source_seconds": prometheus_client.Counter(
+                "disinfo_source_seconds", "Time spent loading and generating each source", ["source", "step"]
+            ),
+            "source_incidents": prometheus_client.Counter(
+                "disinfo_source_incidents", "Incidents imported from each source", ["source"]
+            ),
+            "objects": prometheus_client.Counter(
+                "disinfo_objects_sent", "STIX objects sent to OpenCTI, per type", ["type"]
+            ),
+            "bundle_bytes": prometheus_client.Counter(
+                "disinfo_bundle_bytes_sent", "Size of the bundles sent to OpenCTI"
+            ),
+            "send_seconds": prometheus_client.Histogram(
+                "disinfo_bundle_send_seconds", "Time to send a bundle to OpenCTI, retries included",
+                buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+            ),
+            "send_retries": prometheus_client.Counter(
+                "disinfo_bundle_send_retries", "Retries of the bundles that failed to be sent"
+            ),
+            "send_queue": prometheus_client.Gauge(
+                "disinfo_send_queue_depth", "Bundles waiting to be sent when the last one was sent"
+            ),
+            "peak_rss": prometheus_client.Gauge(
+                "disinfo_peak_rss_bytes", "Peak resident memory of the connector process"
+            ),
+        })
+    return _PROMETHEUS_METRICS
+
+
+def peak_rss() -> int:
+    """Returns the peak resident memory of the process in bytes (0 when unknown)"""
+    if resource is None:
+        return 0
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RunMetrics:
+    """Timers and counters of the stages of a run
+
+    Stages are timed with `stage()` (the same stage can be entered several times, i. e., once per
+    bundle), or with `add_stage()` for work interleaved with other stages. Sources report their own
+    timing and counters with `add_source()`, bundles sent are counted with `add_bundle()` and the
+    latency of each of them is recorded with `add_send()`.
+    Everything is also exported as Prometheus metrics when `prometheus_client` is installed.
+
+    Attributes:
+        stages (dict): Stage name -> seconds.
+        sources (dict): Source name -> timing and counters of the source.
+        objects (Counter): STIX object type -> number of objects sent.
+        bundles (int): Number of bundles sent.
+        bundle_bytes (int): Size of the bundles sent.
+        send_seconds (list): Latency of each bundle sent, retries included.
+        send_retries (int): Retries of the bundles that failed to be sent.
+        send_queue_depth (int): Most bundles waiting to be sent when one was sent.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.sources = {}
+        self.objects = Counter()
+        self.bundles = 0
+        self.bundle_bytes = 0
+        self.send_seconds = []
+        self.send_retries = 0
+        self.send_queue_depth = 0
+        self._prometheus = _prometheus_metrics()
+
+    def add_stage(self, name, seconds) -> None:
+        """Adds time spent in a stage"""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        if self._prometheus:
+            self._prometheus["stage_seconds"].labels(name).inc(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Times the block as (part of) a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def add_source(self, name, stats) -> None:
+        """Records the timing and counters of a source (see `DatasetSource.stats`)"""
+        self.sources[name] = dict(stats)
+        if self._prometheus:
+            self._prometheus["source_seconds"].labels(name, "load").inc(stats["load_seconds"])
+            self._prometheus["source_seconds"].labels(name, "generate").inc(stats["generate_seconds"])
+            self._prometheus["source_incidents"].labels(name).inc(stats["incidents"])
+
+    def add_bundle(self, objects, size) -> None:
+        """Records a bundle sent to OpenCTI"""
+        types = Counter(stix_object["type"] for stix_object in objects)
+        self.objects.update(types)
+        self.bundles += 1
+        self.bundle_bytes += size
+        if self._prometheus:
+            for stix_type, count in types.items():
+                self._prometheus["objects"].labels(stix_type).inc(count)
+            self._prometheus["bundle_bytes"].inc(size)
+
+    def add_send(self, seconds, attempts, queue_depth) -> None:
+        """Records the latency of a bundle sent and the bundles still waiting to be sent"""
+        self.send_seconds.append(seconds)
+        self.send_retries += attempts - 1
+        self.send_queue_depth = max(self.send_queue_depth, queue_depth)
+        if self._prometheus:
+            self._prometheus["send_seconds"].observe(seconds)
+            self._prometheus["send_retries"].inc(attempts - 1)
+            self._prometheus["send_queue"].set(queue_depth)
+
+    def send_summary(self) -> dict:
+        """Returns the latency percentiles (seconds) of the bundles sent, their retries and the deepest queue"""
+        latencies = sorted(self.send_seconds)
+        if not latencies:
+            return {}
+        return {
+            "latency_p50": round(latencies[len(latencies) // 2], 3),
+            "latency_p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+            "latency_max": round(latencies[-1], 3),
+            "retries": self.send_retries,
+            "max_queue_depth": self.send_queue_depth,
+        }
+
+    def summary(self) -> dict:
+        """Returns the summary of the run, also updating the gauges of the last run"""
+        summary = {
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            "sources": {
+                name: {key: round(value, 3) if isinstance(value, float) else value for key, value in stats.items()}
+                for name, stats in self.sources.items()
+            },
+            "objects": dict(self.objects),
+            "bundles": self.bundles,
+            "bundle_bytes": self.bundle_bytes,
+            "send": self.send_summary(),
+            "peak_rss_bytes": peak_rss(),
+        }
+        if self._prometheus:
+            for name, seconds in self.stages.items():
+                self._prometheus["last_stage_seconds"].labels(name).set(seconds)
+            self._prometheus["peak_rss"].set(summary["peak_rss_bytes"])
+        return summary
+
+    def log_summary(self, helper) -> None:
+        helper.log_info(f"Run summary: {json.dumps(self.summary(), sort_keys=True)}")
+
+
+class RunProfiler:
+    """Profiles a run with cProfile or tracemalloc and writes the result to a directory
+
+    Attributes:
+        mode (str): `cprofile` (a `.prof` file, to open with pstats or snakeviz) or `tracemalloc`
+                    (a text file with the lines that allocated the most memory).
+        directory (str): Where the profiles are written.
+    """
+
+    def __init__(self, mode, directory):
+        if mode not in ("cprofile", "tracemalloc"):
+            raise ValueError(f"Unknown profiler '{mode}'. It SHOULD be one of 'cprofile' or 'tracemalloc'")
+        self.mode = mode
+        self.directory = directory
+
+    @contextmanager
+    def profile(self, name):
+        """Profiles the block, writing the profile `name` (without extension) once it is done"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                profiler.dump_stats(path + ".prof")
+            return
+
+        tracemalloc.start(25)
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(path + ".tracemalloc.txt", "w", encoding="utf-8") as f:
+                f.write(f"current: {current} bytes, peak: {peak} bytes\n\n")
+                for stat in snapshot.statistics("lineno")[:50]:
+                    f.write(f"{stat}\n")
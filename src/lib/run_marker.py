@@ -0,0 +1,72 @@
+import json
+import os
+import time
+
+
+def _file_stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class RunMarker:
+    """Local copy of the schedule of the connector, read at startup without OpenCTI
+
+    The connector state lives in the platform, so knowing whether a run is due normally takes the
+    OpenCTI helper (and everything it imports). The marker keeps what is needed to tell it from a
+    small local file: the time of the last successful run, the size and modification time of the
+    watched datasets at that time, and whether a run is in progress (set when a run starts and
+    cleared once it succeeded, so that an interrupted run is always resumed).
+
+    Only the startup check trusts it (see `start.py`): the connector itself still decides from its
+    state in OpenCTI. Deleting the file forces the next start to go through that decision.
+
+    Attributes:
+        path (str): JSON file of the marker.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, marker) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(marker, f)
+        os.replace(tmp_path, self.path)
+
+    def started(self) -> None:
+        """Records that a run started"""
+        marker = self.read() or {}
+        marker["pending"] = True
+        self._write(marker)
+
+    def succeeded(self, timestamp, paths) -> None:
+        """Records a successful run and the state of the watched files at its end"""
+        self._write({
+            "last_run": timestamp,
+            "pending": False,
+            "files": {path: _file_stat(path) for path in paths},
+        })
+
+    def due(self, interval, watch=False, now=None) -> bool:
+        """Whether a run is due: no successful run recorded, a run in progress, the interval elapsed or,
+        with `watch`, a watched file changed since the last run"""
+        marker = self.read()
+        if not marker or marker.get("pending") or "last_run" not in marker:
+            return True
+        now = time.time() if now is None else now
+        if now - marker["last_run"] >= interval:
+            return True
+        if watch:
+            return any(_file_stat(path) != stat for path, stat in marker.get("files", {}).items())
+        return False
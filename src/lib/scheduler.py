@@ -0,0 +1,95 @@
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from lib.generators import GENERATORS
+from lib.stix_graph import StixGraphBuilder
+from lib.technique_resolver import TechniqueResolver
+
+
+def generate_partition(kind, rows, technique_ids, namespace, validate, timestamp):
+    """Builds the groups of a partition of a dataset (run in a worker process)
+
+    Returns:
+        tuple: The groups, the technique resolver hits, fallbacks and misses of the partition and the time spent.
+    """
+    start = time.perf_counter()
+    resolver = TechniqueResolver(technique_ids)
+    graph = StixGraphBuilder(namespace, validate, timestamp)
+    generate = GENERATORS[kind]
+    groups = [graph.group(generate(row, resolver, graph)) for row in rows]
+    return groups, resolver.hits, resolver.fallbacks, resolver.misses, time.perf_counter() - start
+
+
+class GenerationScheduler:
+    """Runs the STIX generators of the datasets of a run
+
+    With a single worker the incidents are generated one after the other in this process. With more
+    workers every dataset is split into partitions of `partition_rows` incidents which are generated
+    by a pool of processes, all the datasets at the same time. Results are merged back in dataset and
+    partition order through the run graph, so the output is the same whatever the number of workers.
+
+    Attributes:
+        workers (int): Number of worker processes (1 to generate in this process).
+        partition_rows (int): Number of incidents per partition.
+    """
+
+    def __init__(self, workers=1, partition_rows=5000):
+        self.workers = workers
+        self.partition_rows = partition_rows
+
+    def _partitions(self, jobs):
+        for kind, chunks, stats in jobs:
+            for rows in chunks:
+                for start in range(0, len(rows), self.partition_rows):
+                    yield kind, rows[start:start + self.partition_rows], stats
+
+    def generate(self, jobs, resolver, graph):
+        """Yields the groups of STIX objects of every incident
+
+        Args:
+            jobs (list): (generator kind, chunks of incident rows, stats) of each dataset, see
+                         `lib/generators.py`. The chunks are consumed lazily, so they can be read
+                         from the dataset while the previous ones are generated.
+                         The generation time (in the workers) and the number of objects of the dataset
+                         are added to `generate_seconds` and `objects` of its stats dict.
+            resolver (TechniqueResolver): The DISARM techniques of the run.
+            graph (StixGraphBuilder): The graph of the run.
+        """
+        if self.workers <= 1:
+            for kind, chunks, stats in jobs:
+                generate = GENERATORS[kind]
+                for rows in chunks:
+                    for row in rows:
+                        start = time.perf_counter()
+                        group = graph.group(generate(row, resolver, graph))
+                        stats["generate_seconds"] += time.perf_counter() - start
+                        stats["objects"] += len(group)
+                        yield group
+            return
+
+        partitions = self._partitions(jobs)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            # Keep a bounded number of partitions in flight and consume them in order
+            pending = deque()
+            for kind, rows, stats in partitions:
+                pending.append((stats, pool.submit(
+                    generate_partition, kind, rows, resolver.ids, graph.namespace, graph.validate, graph.timestamp
+                )))
+                if len(pending) >= 2 * self.workers:
+                    yield from self._merge(pending.popleft(), resolver, graph)
+            while pending:
+                yield from self._merge(pending.popleft(), resolver, graph)
+
+    @staticmethod
+    def _merge(partition, resolver, graph):
+        stats, future = partition
+        groups, hits, fallbacks, misses, elapsed = future.result()
+        resolver.hits += hits
+        resolver.fallbacks.update(fallbacks)
+        resolver.misses.update(misses)
+        stats["generate_seconds"] += elapsed
+        for group in groups:
+            group = graph.merge(group)
+            stats["objects"] += len(group)
+            yield group
@@ -0,0 +1,57 @@
+import hashlib
+
+from lib.generators import INTRUSION_SET_KEYS
+from lib.entity_normalizer import deterministic_id
+
+
+class Shard:
+    """The part of the incidents imported by one of several instances of the connector
+
+    Incidents are assigned by the deterministic ID of their intrusion set, hashed (SHA-256, so the
+    partition is the same in every process and on every host) modulo the number of shards. All the
+    incidents of an intrusion set are imported by the same instance. Shared entities (locations,
+    threat actors) and the relationships between them are sent by every shard that needs them; as
+    their IDs are deterministic, OpenCTI merges them into the same objects.
+
+    A shared entity is built from its normalized entity alone (see `StixGraphBuilder.threat_actor`),
+    whichever incident refers to it first, so every shard sends the same content as a single
+    instance would without knowing the incidents of the others.
+
+    Attributes:
+        index (int): Index of this instance, from 0 to `count` - 1.
+        count (int): Number of instances.
+    """
+
+    def __init__(self, index=0, count=1):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Invalid shard {index} of {count}: the index SHOULD be between 0 and the count - 1")
+        self.index = index
+        self.count = count
+
+    def owns(self, stix_id) -> bool:
+        """Whether the object with this ID belongs to this shard"""
+        digest = hashlib.sha256(stix_id.encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") % self.count == self.index
+
+    def select(self, kind, rows, namespace):
+        """Returns the incident rows of the shard, a table of the same type for an `IncidentTable`
+
+        Args:
+            kind (str): The generator of the rows, see `lib/generators.py`.
+            rows (list): The incident rows.
+            namespace (uuid.UUID): Namespace of the deterministic IDs of the run graph.
+        """
+        if self.count == 1:
+            return rows
+        intrusion_set_key = INTRUSION_SET_KEYS[kind]
+        owned = {}
+        positions = []
+        for position, row in enumerate(rows):
+            key = intrusion_set_key(row)
+            if key not in owned:
+                owned[key] = self.owns(deterministic_id(namespace, "intrusion-set", key))
+            if owned[key]:
+                positions.append(position)
+        if hasattr(rows, "take"):
+            return rows.take(positions)
+        return [rows[position] for position in positions]
@@ -0,0 +1,196 @@
+import json
+
+from lib.config import parse_interval
+from lib.generators import GENERATORS
+
+# The loaders import the dataframe stack (pandas, numpy) when they are first called, so the connector
+# starts (and decides whether a run is due) without it
+
+
+def load_fulde_rows(path, cache=None, mapping=None):
+    """Incident rows of a Fulde-format CSV, as an `IncidentTable` (see `lib/margot_dataset_importer.py`)"""
+    from lib.margot_dataset_importer import load_data
+
+    return load_data(path, cache, mapping)
+
+
+def stream_fulde_rows(path, chunk_rows, mapping=None):
+    """Incident rows of a Fulde-format CSV, read in chunks of up to `chunk_rows` incidents"""
+    from lib.margot_dataset_importer import iter_data
+
+    return iter_data(path, chunk_rows, mapping)
+
+
+def load_disarm_rows(path, cache=None, mapping=None) -> list:
+    """Incident rows of a DISARM workbook, with the `technique_ids` of each incident"""
+    from lib.disarm_workbook import load_workbook
+
+    workbook = load_workbook(path, cache, mapping)
+    # available columns are:
+    # disarm_id, name, objecttype, summary, year_started, attributions_seen,
+    # found_in_country, urls, notes, when_added, found_via, longname
+    # plus the technique_ids of the incident in the incidenttechniques sheet
+    return [
+        dict(row, technique_ids=workbook.techniques_by_incident.get(row['disarm_id'], []))
+        for row in workbook.incidents
+    ]
+
+
+def load_disarm_fulde_rows(path, cache=None, mapping=None):
+    """Incident rows of a DISARM workbook converted in-process to the Fulde format
+
+    Same records as converting the workbook with `datasets/disarm_incidents_to_foulde.py` and
+    loading the CSV as a `fulde-csv` source.
+    """
+    from datasets.disarm_incidents_to_foulde import to_frame
+    from lib.margot_dataset_importer import incidents_from_parsed, parse_frame
+
+    if cache is None:
+        parsed = parse_frame(to_frame(path))
+    else:
+        parsed = cache.get(path, lambda path: parse_frame(to_frame(path)), variant={"format": "disarm-fulde-xlsx"})
+    return incidents_from_parsed(parsed)
+
+
+# Dataset formats: format name -> (loader, generator kind in `GENERATORS`). A new format is added by
+# registering its loader here and its generator in `lib/generators.py`.
+FORMATS = {
+    "fulde-csv": (load_fulde_rows, "margotfulde"),
+    "disarm-xlsx": (load_disarm_rows, "disarm"),
+    "disarm-fulde-xlsx": (load_disarm_fulde_rows, "margotfulde"),
+}
+
+# Formats that can also be read chunk by chunk: format name -> loader yielding the chunks of rows
+STREAMING_LOADERS = {
+    "fulde-csv": stream_fulde_rows,
+}
+
+# Sources used when no source file is configured. The merged Fulde CSV already holds the incidents of
+# the DISARM workbook (under their names, so with other intrusion set IDs): importing both would send
+# them twice, the workbook is only listed to be enabled in a source file of its own
+DEFAULT_SOURCES = [
+    {"name": "disarm", "format": "disarm-xlsx", "path": "datasets/DISARM_DATA_MASTER_additions.xlsx", "enabled": False},
+    {"name": "margotfulde", "format": "fulde-csv", "path": "datasets/merged_Foulde_DSRM_additions.csv"},
+]
+
+
+class DatasetSource:
+    """A dataset imported by the connector
+
+    Attributes:
+        name (str): Unique name of the source, used in the logs and as key of its state.
+        format (str): One of `FORMATS`.
+        path (str): Path of the dataset file.
+        mapping (dict): Column (or sheet) names that differ from the format ones, passed to the loader.
+        run_every (int): Minimum number of seconds between two imports of the source (0 to import it
+                         on every run of the connector).
+        ttl (int): In delta mode, number of seconds after which the whole source is imported again
+                   even if it did not change (0 for never).
+        enabled (bool): Whether the source is imported.
+        stats (dict): Timing and counters of the source in the current run.
+    """
+
+    def __init__(self, name, format, path, mapping=None, run_every=0, ttl=0, enabled=True):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format '{format}' of source '{name}'. It SHOULD be one of {sorted(FORMATS)}")
+        self.name = name
+        self.format = format
+        self.path = path
+        self.mapping = dict(mapping or {})
+        self.run_every = run_every
+        self.ttl = ttl
+        self.enabled = enabled
+        self.reset_stats()
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds a source from its configuration entry (intervals in the `CONNECTOR_RUN_EVERY` format)"""
+        try:
+            return cls(
+                config["name"],
+                config["format"],
+                config["path"],
+                config.get("mapping"),
+                parse_interval(config["run_every"]) if config.get("run_every") else 0,
+                parse_interval(config["ttl"]) if config.get("ttl") else 0,
+                bool(config.get("enabled", True)),
+            )
+        except KeyError as ex:
+            raise ValueError(f"Missing {ex} in the source configuration {config}") from ex
+
+    @property
+    def kind(self) -> str:
+        """The generator of the incidents of the source, see `lib/generators.py`"""
+        return FORMATS[self.format][1]
+
+    @property
+    def streams(self) -> bool:
+        """Whether the source can be read chunk by chunk, see `stream()`"""
+        return self.format in STREAMING_LOADERS
+
+    def reset_stats(self) -> None:
+        self.stats = {"load_seconds": 0.0, "generate_seconds": 0.0, "incidents": 0, "objects": 0}
+
+    def due(self, last_run, now) -> bool:
+        """Whether the source has to be imported, given the time of its last successful import"""
+        return last_run is None or now - last_run >= self.run_every
+
+    def expired(self, last_full, now) -> bool:
+        """Whether the whole source has to be imported again, given the time of its last full import"""
+        return bool(self.ttl) and (last_full is None or now - last_full >= self.ttl)
+
+    def load(self, cache=None):
+        """Returns the incident rows of the source (a list, or an `IncidentTable`)"""
+        load = FORMATS[self.format][0]
+        return load(self.path, cache, self.mapping)
+
+    def stream(self, chunk_rows):
+        """Yields the incident rows of the source in chunks of up to `chunk_rows` incidents
+
+        The chunks are read from the file as they are consumed, without the dataset cache.
+        """
+        return STREAMING_LOADERS[self.format](self.path, chunk_rows, self.mapping)
+
+
+class SourceRegistry:
+    """The datasets imported by the connector
+
+    The sources are read from a JSON file holding a list of entries such as:
+
+        {"name": "fulde", "format": "fulde-csv", "path": "datasets/fulde.csv",
+         "mapping": {"year": "Year started"}, "run_every": "1d", "ttl": "7d", "enabled": true}
+
+    Attributes:
+        sources (list): The `DatasetSource` in import order.
+    """
+
+    def __init__(self, sources):
+        names = [source.name for source in sources]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicated source names: {duplicates}")
+        for source in sources:
+            if source.kind not in GENERATORS:
+                raise ValueError(f"No generator '{source.kind}' for the format of source '{source.name}'")
+        self.sources = list(sources)
+
+    @classmethod
+    def from_config(cls, configs):
+        return cls([DatasetSource.from_config(config) for config in configs])
+
+    @classmethod
+    def from_file(cls, path=None):
+        """Loads the registry from a JSON file, or the default sources when no path is given"""
+        if not path:
+            return cls.from_config(DEFAULT_SOURCES)
+        with open(path, encoding="utf-8") as f:
+            configs = json.load(f)
+        if isinstance(configs, dict):
+            configs = configs.get("sources", [])
+        return cls.from_config(configs)
+
+    def __iter__(self):
+        return iter(self.sources)
+
+    def enabled(self) -> list:
+        return [source for source in self.sources if source.enabled]
@@ -0,0 +1,154 @@
+import stix2
+
+from lib.entity_normalizer import EntityNormalizer, deterministic_id
+
+
+class StixGraphBuilder:
+    """Builds the STIX objects of a run as a graph of unique nodes and edges
+
+    Entities get deterministic IDs (uuid5 of their key in the connector namespace) and are interned:
+    asking twice for the same entity returns the same object instead of building a new one. Countries
+    and threat actors are named and identified by the `normalizer` of the graph.
+    Relationships also get deterministic IDs, built from their (source, type, target) triple, so
+    repeated relationships can be recognised.
+
+    Each group of objects passed through `group()` keeps its entities, so it can still be sent on its
+    own, but drops the relationships already emitted earlier in the run. Entities repeated in the
+    same bundle are removed when bundling (see `BundleChunker`), so every unique node and edge is
+    sent once per bundle.
+
+    By default the objects are plain STIX 2.1 dicts built from templates sharing the run timestamp,
+    which skips the property validation of the `stix2` library. With `validate` they are built as
+    `stix2` objects instead; both serialize to the same JSON (see `benchmarks/template_check.py`).
+
+    Attributes:
+        namespace (uuid.UUID): Namespace of the deterministic IDs.
+        validate (bool): Whether to build (and validate) the objects with the `stix2` library.
+        timestamp (str): `created` and `modified` of the objects, the start of the run by default.
+        normalizer (EntityNormalizer): Canonical countries and threat actors of the run.
+    """
+
+    def __init__(self, namespace, validate=False, timestamp=None):
+        self.namespace = namespace
+        self.validate = validate
+        self.timestamp = timestamp or stix2.utils.format_datetime(stix2.utils.get_timestamp())
+        self.normalizer = EntityNormalizer(namespace)
+        self._nodes = {}
+        self._edges = set()
+
+    def _template(self, stix_type, stix_id, **properties) -> dict:
+        # Same property order as the stix2 serialization, None values are left out
+        stix_object = {
+            "type": stix_type,
+            "spec_version": "2.1",
+            "id": stix_id,
+            "created": self.timestamp,
+            "modified": self.timestamp,
+        }
+        for name, value in properties.items():
+            if value is not None:
+                stix_object[name] = value
+        return stix_object
+
+    def _id(self, stix_type, key) -> str:
+        return deterministic_id(self.namespace, stix_type, key)
+
+    def _intern(self, stix_id, build):
+        node = self._nodes.get(stix_id)
+        if node is None:
+            node = build()
+            self._nodes[stix_id] = node
+        return node
+
+    def _build(self, stix_class, stix_type, stix_id, **properties):
+        if self.validate:
+            return stix_class(id=stix_id, created=self.timestamp, modified=self.timestamp, **properties)
+        return self._template(stix_type, stix_id, **properties)
+
+    def location(self, country):
+        """Location of a country or region, an `Entity` of the normalizer"""
+        return self._intern(country.stix_id, lambda: self._build(
+            stix2.Location, "location", country.stix_id,
+            name=country.name,
+            country=country.country_code or country.name
+        ))
+
+    def threat_actor(self, actor):
+        """Threat actor of an `Entity` of the normalizer
+
+        Named after the entity only, whatever the dataset it comes from: the first incident to refer
+        to an actor builds it, so a name given by the dataset would depend on which sources are
+        enabled and in what order.
+        """
+        return self._intern(actor.stix_id, lambda: self._build(
+            stix2.ThreatActor, "threat-actor", actor.stix_id,
+            name=actor.name,
+            threat_actor_types=["nation-state"],
+            labels=["threat-actor"]
+        ))
+
+    def intrusion_set(self, key, name, description, labels):
+        stix_id = self._id("intrusion-set", key)
+        return self._intern(stix_id, lambda: self._build(
+            stix2.IntrusionSet, "intrusion-set", stix_id,
+            name=str(name),
+            description=None if description is None else str(description),
+            labels=labels
+        ))
+
+    def relationship(self, source_ref, relationship_type, target_ref):
+        # Not interned: a relationship is fully defined by its ID, and only the IDs of the edges are
+        # kept (see `group()`), so memory does not grow with every relationship of the run
+        stix_id = self._id("relationship", f"{source_ref}|{relationship_type}|{target_ref}")
+        return self._build(
+            stix2.Relationship, "relationship", stix_id,
+            relationship_type=relationship_type,
+            source_ref=source_ref,
+            target_ref=target_ref
+        )
+
+    def note(self, key, abstract, content, object_refs):
+        # Not interned: notes are only built once per run (see `AggregateIndex.notes()`)
+        stix_id = self._id("note", key)
+        return self._build(
+            stix2.Note, "note", stix_id,
+            abstract=abstract,
+            content=content,
+            object_refs=object_refs
+        )
+
+    def node(self, stix_id):
+        """Returns the entity of an ID if it was built in the run, None otherwise"""
+        return self._nodes.get(stix_id)
+
+    def group(self, stix_objects) -> list:
+        """Returns the objects of a group without the relationships already emitted in the run"""
+        group = []
+        for stix_object in stix_objects:
+            if stix_object["type"] == "relationship":
+                if stix_object["id"] in self._edges:
+                    continue
+                self._edges.add(stix_object["id"])
+            group.append(stix_object)
+        return group
+
+    def merge(self, stix_objects) -> list:
+        """Same as `group()` for a group built by another builder (i. e., in a worker process)
+
+        Entities already known by this builder are replaced by the known object, so the result is the
+        same as if the group had been built here.
+        """
+        interned = []
+        for stix_object in stix_objects:
+            if stix_object["type"] != "relationship":
+                stix_object = self._nodes.setdefault(stix_object["id"], stix_object)
+            interned.append(stix_object)
+        return self.group(interned)
+
+    @property
+    def node_count(self) -> int:
+        return len(self._nodes)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._edges)
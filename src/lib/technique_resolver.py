@@ -0,0 +1,70 @@
+from collections import Counter
+
+
+class TechniqueResolver:
+    """Resolves DISARM technique codes to the STIX IDs of the attack patterns in OpenCTI
+
+    The index is built once per run, so every lookup is a dictionary access instead of a scan
+    over the whole attack pattern list. Sub-techniques that are not in the platform
+    (i. e., `T0084.001`) fall back to their parent technique (`T0084`); they are counted apart, as
+    their relationships point at a coarser attack pattern than the dataset gives.
+
+    Attributes:
+        hits (int): Number of codes resolved to their own attack pattern.
+        fallbacks (Counter): Number of times each sub-technique code was resolved to its parent.
+        misses (Counter): Number of times each unresolved code was looked up.
+    """
+
+    def __init__(self, ids):
+        """
+        Args:
+            ids (dict): DISARM technique code (`x_mitre_id`) -> `standard_id`.
+        """
+        self.ids = dict(ids)
+        self.hits = 0
+        self.fallbacks = Counter()
+        self.misses = Counter()
+
+    @classmethod
+    def from_attack_patterns(cls, attack_patterns):
+        """Builds the resolver from the attack patterns returned by `helper.api.attack_pattern.list()`"""
+        ids = {}
+        for attack_pattern in attack_patterns:
+            code = attack_pattern.get("x_mitre_id")
+            # Keep the first one, as the previous linear scan did
+            if code and code not in ids:
+                ids[code] = attack_pattern["standard_id"]
+        return cls(ids)
+
+    def resolve(self, code):
+        """Returns the STIX ID of a technique code, or None if it is not in DISARM"""
+        technique_id = self.ids.get(code)
+        if technique_id is not None:
+            self.hits += 1
+            return technique_id
+        if "." in code:
+            technique_id = self.ids.get(code.split(".")[0])
+        if technique_id is None:
+            self.misses[code] += 1
+        else:
+            self.fallbacks[code] += 1
+        return technique_id
+
+    def log_summary(self, helper):
+        """Logs the lookups of the run as a single line instead of one error per missing technique"""
+        if self.misses:
+            missing = ", ".join(f"{code} ({count})" for code, count in sorted(self.misses.items()))
+            helper.log_error(
+                f"{sum(self.misses.values())} technique lookups ({len(self.misses)} distinct codes) "
+                f"not found in DISARM: {missing}"
+            )
+        if self.fallbacks:
+            fallen_back = ", ".join(f"{code} ({count})" for code, count in sorted(self.fallbacks.items()))
+            helper.log_warning(
+                f"{sum(self.fallbacks.values())} technique lookups ({len(self.fallbacks)} distinct sub-techniques) "
+                f"not found in DISARM, resolved to their parent technique: {fallen_back}"
+            )
+        helper.log_info(
+            f"Resolved {self.hits} technique lookups against {len(self.ids)} DISARM attack patterns"
+            + (f", {sum(self.fallbacks.values())} more to the parent technique" if self.fallbacks else "")
+        )
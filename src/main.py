@@ -1,266 +1,76 @@
 import os
 import sys
 import time
+import uuid
 
-import stix2
 from lib.external_import import ExternalImportConnector
 
-from io import BytesIO
-import pandas as pd
-import requests
-import uuid
+from lib.aggregate_index import AggregateIndex
 
-from lib.margot_dataset_importer import load_data
+from lib.technique_resolver import TechniqueResolver
+from lib.attack_pattern_cache import AttackPatternCache
+from lib.config import parse_interval
+from lib.delta import DeltaTracker, content_hash
+from lib.run_marker import RunMarker
+from lib.dataset_cache import DatasetCache
+from lib.stix_graph import StixGraphBuilder
+from lib.scheduler import GenerationScheduler
+from lib.sharding import Shard
+from lib.sources import SourceRegistry
 
 class CustomConnector(ExternalImportConnector):
 
     NAMESPACE_UUID = uuid.UUID('12345678-1234-5678-1234-567812345678')
 
-    def generate_margotfulde_incidents_stix_objects(self, disarm, margot_dataset_path):
-
-        self.helper.log_debug("Creating disinformation Margot Fulde objects...")
-
-        stix_objects = []
-        incidents = load_data(margot_dataset_path)
-        for incident in incidents:
-            country_objects = []
-            countries = incident['target_country']
-            if countries:
-                countries = countries.split(",")
-            for country in countries:
-                country_id = country
-                country_name = country
-                country_object = stix2.Location(
-                    id="location--" + str(uuid.uuid5(self.NAMESPACE_UUID, country_id)),
-                    name=country_name,
-                    country=country
-                )
-                country_objects.append(country_object)
-
-            # Create the actor object (separated by commas or not present)
-            actor_objects = []
-            actors = ['Unknown']
-            if incident['threat_actor']:
-                self.helper.log_info(incident['threat_actor'])
-                actors = incident['threat_actor'].split(",")
-            for actor in actors:
-                # Create the threat actor object
-                actor_id = actor
-                actor_name = actor 
-                threat_actor = stix2.ThreatActor(
-                    id="threat-actor--" + str(uuid.uuid5(self.NAMESPACE_UUID, actor_id)),
-                    name=actor_name,
-                    threat_actor_types = ["nation-state"],
-                    labels=["threat-actor"]
-                )
-                actor_objects.append(threat_actor)
-
-            # Get the techniques associated with this incident
-            technique_ids = []
-            for technique in incident['techniques']:
-                technique_disarm_id = technique
-                # Search in the DISARM dictionary, the STIX ID of the technique to create the relationship
-                technique_id = None
-                for stix_object in disarm:
-                    if (stix_object["x_mitre_id"]== technique_disarm_id):
-                            technique_id = stix_object["standard_id"]
-                            break
-                if technique_id is None:
-                    self.helper.log_error(f"Technique {technique_disarm_id} not found in DISARM.json")
-                    continue
-
-                technique_ids.append(technique_id)
-
-            # Create a campaign object to represent the incident (campaign is the closest object to an incident in STIX)
-            # Relate the campaign with the actors, locations and techniques.
-            intrusion_id = incident['event']
-            intrusion_name = incident['event']
-            intrusion_description = incident['event_description']
-            intrusion_object = stix2.IntrusionSet(
-                id="intrusion-set--" + str(uuid.uuid5(self.NAMESPACE_UUID, intrusion_id)),
-                name=intrusion_name,
-                description=intrusion_description,
-                labels=["incident", "disinformation","margotfulde"]
-            )
-
-            # Create the relationship between the used techniques and the incident
-            for technique in technique_ids:
-                relationship_technique = stix2.Relationship(
-                    source_ref=intrusion_object.id,
-                    relationship_type="uses",
-                    target_ref=technique
-                )
-                stix_objects.append(relationship_technique)
-
-            # Create the relationship between the actors and the incident
-            for actor in actor_objects:
-                relationship_actor = stix2.Relationship(
-                    source_ref=intrusion_object.id,
-                    relationship_type="attributed-to",
-                    target_ref=actor.id
-                )
-                stix_objects.append(relationship_actor)
-
-            # Create the relationship between the locations and the incident
-            for country in country_objects:
-                relationship_country = stix2.Relationship(
-                    source_ref=intrusion_object.id,
-                    relationship_type="targets",
-                    target_ref=country.id
-                )
-                stix_objects.append(relationship_country)
-
-            stix_objects.append(intrusion_object)
-            stix_objects.extend(actor_objects)
-            stix_objects.extend(country_objects)
-        return stix_objects
-
-
-    def generate_disinfo_incidents_stix_objects(self, disarm):
-
-        xls_data = "DISARM_DATA_MASTER_additions.xlsx"
-        df = pd.read_excel(xls_data, sheet_name="incidents")
-
-       # Replace NaN or infinite values with None to make them JSON serializable
-        df = df.replace({float('inf'): None, float('-inf'): None})
-        df = df.where(pd.notnull(df), None)
-
-        # available columns are: 
-        # disarm_id, name, objecttype, summary, year_started, attributions_seen, 
-        # found_in_country, urls, notes, when_added, found_via, longname
-
-        # Here the plan is to create associations between incidents, techniques and actors.
-        # We will create relationships between incidents and techniques, and between incidents and actors.
-        stix_objects = []
-        self.helper.log_debug("Creating disinformation STIX objects...")
-        for index, row in df.iterrows():
-            # Now for this incident we also can get the techniques associated to this incident ID in the incidenttechniques sheet and create relationships to the threat actor (country):
-            # incidentstechniques sheet header: disarm_id, name, incident_id, technique_ids, summary
-            # Now lets apply SJ Terp's logic to create the STIX objects: https://x.com/bodaceacat/status/1189525720609050625
-            # Create the targeted country object (separated by commas)
-            country_objects = []
-            countries = row['found_in_country']
-            if countries:
-                countries = countries.split(",")
-            for country in countries:
-                country_id = country
-                country_name = country
-                country_object = stix2.Location(
-                    id="location--" + str(uuid.uuid5(self.NAMESPACE_UUID, country_id)),
-                    name=country_name,
-                    country=country
-                )
-                country_objects.append(country_object)
-
-
-            # Create the actor object (separated by commas or not present)
-            actor_objects = []
-            actors = ['Unknown']
-            if row['attributions_seen']:
-                actors = row['attributions_seen'].split(",")
-            for actor in actors:
-                # Create the threat actor object
-                actor_id = actor
-                actor_name = actor + " State"
-                threat_actor = stix2.ThreatActor(
-                    id="threat-actor--" + str(uuid.uuid5(self.NAMESPACE_UUID, actor_id)),
-                    name=actor_name,
-                    threat_actor_types = ["nation-state"],
-                    labels=["threat-actor"]
-                )
-                actor_objects.append(threat_actor)
-
-            # Get the techniques associated with this incident
-            technique_ids = []
-            campaign_id = row['disarm_id']
-            techniques = pd.read_excel(xls_data, sheet_name="incidenttechniques")
-            techniques = techniques.where(pd.notnull(techniques), None)
-            incident_techniques = techniques[techniques['incident_id'] == campaign_id]
-
-
-
-            for tech_index, tech_row in incident_techniques.iterrows():
-                technique_disarm_id = tech_row['technique_ids']
-                # Search in the DISARM dictionary, the STIX ID of the technique to create the relationship
-                technique_id = None
-                # read from octi
-                # https://docs.opencti.io/5.8.X/development/connectors/#reading-from-the-opencti-platform
-                # https://docs.opencti.io/5.12.X/reference/filters/
-                # https://www.mickaelwalter.fr/opencti-use-the-api/
-                for stix_object in disarm:
-                    if (stix_object["x_mitre_id"]== technique_disarm_id):
-                            technique_id = stix_object["standard_id"]
-                            break
-                if technique_id is None:
-                    self.helper.log_error(f"Technique {technique_disarm_id} not found in DISARM.json")
-                    continue
-
-                technique_ids.append(technique_id)
-
-
-                # Create the relationship between the actors, locations and techniques
-                for actor_object in actor_objects:
-                    relationship_actor = stix2.Relationship(
-                        source_ref=threat_actor.id,
-                        relationship_type="uses",
-                        target_ref=technique_id
-                    )
-                    stix_objects.append(relationship_actor)
-                for country in country_objects:
-                    relationship_country = stix2.Relationship(
-                        source_ref=technique_id,
-                        relationship_type="targets",
-                        target_ref=country_object.id
-                    )
-                    stix_objects.append(relationship_country)
-
-                    #technique_objects.append(attack_pattern)
-
-            # Create a campaign object to represent the incident (campaign is the closest object to an incident in STIX)
-            # Relate the campaign with the actors, locations and techniques.
-            intrusion_id = row['disarm_id']
-            intrusion_name = row['name']
-            intrusion_description = row['summary']
-            intrusion_object = stix2.IntrusionSet(
-                id="intrusion-set--" + str(uuid.uuid5(self.NAMESPACE_UUID, intrusion_id)),
-                name=intrusion_name,
-                description=intrusion_description,
-                labels=["incident", "disinformation","disarm"]
-            )
-
-
-            # Create the relationship between the used techniques and the incident
-            # for technique in technique_objects:
-            for technique in technique_ids:
-                relationship_technique = stix2.Relationship(
-                    source_ref=intrusion_object.id,
-                    relationship_type="uses",
-                    target_ref=technique
-                )
-                stix_objects.append(relationship_technique)
-
-            # Create the relationship between the actors and the incident
-            for actor in actor_objects:
-                relationship_actor = stix2.Relationship(
-                    source_ref=intrusion_object.id,
-                    relationship_type="attributed-to",
-                    target_ref=actor.id
-                )
-                stix_objects.append(relationship_actor)
-
-            # Create the relationship between the locations and the incident
-            for country in country_objects:
-                relationship_country = stix2.Relationship(
-                    source_ref=intrusion_object.id,
-                    relationship_type="targets",
-                    target_ref=country.id
-                )
-                stix_objects.append(relationship_country)
+    def load_source(self, source, delta=None) -> list:
 
-            stix_objects.append(intrusion_object)
-            stix_objects.extend(actor_objects)
-            stix_objects.extend(country_objects)
-        return stix_objects
+        # The datasets are parsed once (and kept in the dataset cache between runs)
+        start = time.perf_counter()
+        rows = source.load(self.dataset_cache)
+        rows = self.shard.select(source.kind, rows, self.NAMESPACE_UUID)
+        source.stats["load_seconds"] = time.perf_counter() - start
+        self.helper.log_info(
+            f"{len(rows)} incidents loaded from {source.path} ({source.name}) in {source.stats['load_seconds']:.3f}s "
+            f"({'cached' if self.dataset_cache.hit else 'parsed'})"
+        )
+        self.observe_aggregates(source, rows)
+        if delta is not None:
+            # Only the incidents added or changed since the last successful run
+            changed = delta.changed_incidents(source.name, rows)
+            self.helper.log_info(f"{len(changed)} of {len(rows)} incidents changed in {source.name}")
+            rows = changed
+        source.stats["incidents"] = len(rows)
+        return rows
+
+    def observe_aggregates(self, source, rows) -> None:
+        """Passes all the incidents loaded from a source (changed or not) to the aggregate index"""
+        if self.aggregates is None:
+            return
+        with self.metrics.stage("aggregate"):
+            self.aggregates.observe(source.name, source.kind, rows)
+
+    def stream_source(self, source, delta=None):
+        """Yields the incident rows of a source chunk by chunk, as they are read from its file"""
+        chunks = source.stream(self.stream_chunk_rows)
+        loaded = 0
+        while True:
+            start = time.perf_counter()
+            rows = next(chunks, None)
+            source.stats["load_seconds"] += time.perf_counter() - start
+            if rows is None:
+                break
+            rows = self.shard.select(source.kind, rows, self.NAMESPACE_UUID)
+            loaded += len(rows)
+            self.observe_aggregates(source, rows)
+            if delta is not None:
+                rows = delta.changed_incidents(source.name, rows)
+            # Counted before the chunk is generated, the positions of the checkpoints follow it
+            source.stats["incidents"] += len(rows)
+            yield rows
+        self.helper.log_info(
+            f"{loaded} incidents streamed from {source.path} ({source.name}) in {source.stats['load_seconds']:.3f}s"
+            + (f", {source.stats['incidents']} changed" if delta is not None else "")
+        )
 
     def __init__(self):
         """Initialization of the connector
@@ -280,46 +90,307 @@ class CustomConnector(ExternalImportConnector):
         """
         super().__init__()
 
-    def _collect_intelligence(self) -> []:
+        # Local working files (caches) of the connector
+        self.cache_dir = os.environ.get("CONNECTOR_CACHE_DIR", "cache")
+
+        # Schedule of the runs, read by `start.py` to skip the startup when no run is due
+        self.run_marker = RunMarker(os.path.join(self.cache_dir, "run_marker.json"))
+
+        # The DISARM framework rarely changes, keep its attack patterns on disk between runs
+        disarm_cache_ttl = os.environ.get("CONNECTOR_DISARM_CACHE_TTL", "1d")
+        try:
+            self.disarm_cache = AttackPatternCache(
+                os.path.join(self.cache_dir, "disarm_attack_patterns.json"),
+                parse_interval(disarm_cache_ttl),
+            )
+        except ValueError as ex:
+            msg = f"Error when grabbing CONNECTOR_DISARM_CACHE_TTL environment variable: '{disarm_cache_ttl}'. {str(ex)}"
+            self.helper.log_error(msg)
+            raise ValueError(msg) from ex
+
+        # Only send the incidents that changed since the last successful run
+        self.delta_mode = os.environ.get("CONNECTOR_DELTA_MODE", "false").lower() == "true"
+        self.delta = None
+
+        # Worker processes generating the STIX objects (1 to generate them in this process)
+        try:
+            self.scheduler = GenerationScheduler(
+                int(os.environ.get("CONNECTOR_WORKERS", 1)),
+                int(os.environ.get("CONNECTOR_PARTITION_ROWS", 5000)),
+            )
+        except ValueError as ex:
+            msg = f"Error ({ex}) when grabbing CONNECTOR_WORKERS or CONNECTOR_PARTITION_ROWS environment variables. They SHOULD be integers."
+            self.helper.log_error(msg)
+            raise ValueError(msg) from ex
+
+        # Build the objects with the stix2 library (validating them) instead of the faster plain dicts
+        self.stix_validation = os.environ.get("CONNECTOR_STIX_VALIDATION", "false").lower() == "true"
+
+        # Read the datasets that allow it in chunks of this many incidents, generating each chunk before
+        # reading the next one (0 to load them whole, through the dataset cache)
+        try:
+            self.stream_chunk_rows = int(os.environ.get("CONNECTOR_STREAM_CHUNK_ROWS", 0))
+        except ValueError as ex:
+            msg = f"Error ({ex}) when grabbing CONNECTOR_STREAM_CHUNK_ROWS environment variable. It SHOULD be an integer."
+            self.helper.log_error(msg)
+            raise ValueError(msg) from ex
+
+        # Parsed datasets are kept between runs and only parsed again when their file changes
+        self.dataset_cache = DatasetCache(self.cache_dir)
+
+        # Datasets to import, with their format, column mapping and schedule
+        sources_file = os.environ.get("CONNECTOR_SOURCES")
+        try:
+            self.sources = SourceRegistry.from_file(sources_file)
+        except (OSError, ValueError) as ex:
+            msg = f"Error when loading the sources of CONNECTOR_SOURCES environment variable: '{sources_file}'. {str(ex)}"
+            self.helper.log_error(msg)
+            raise ValueError(msg) from ex
+        self.source_state = {}
+        self.position = {}
+
+        # Counts of the techniques by technique, actor, country and year, kept up to date in the cache
+        # directory, and optionally published as notes on the actors and countries whose counts changed
+        self.aggregate_index = os.environ.get("CONNECTOR_AGGREGATE_INDEX", "false").lower() == "true"
+        self.aggregate_notes = os.environ.get("CONNECTOR_AGGREGATE_NOTES", "false").lower() == "true"
+        if self.aggregate_notes and not self.aggregate_index:
+            self.helper.log_warning("CONNECTOR_AGGREGATE_NOTES is ignored since CONNECTOR_AGGREGATE_INDEX is false")
+            self.aggregate_notes = False
+        self.aggregates = None
+
+        # Part of the incidents imported by this instance, when several instances share the datasets
+        try:
+            self.shard = Shard(
+                int(os.environ.get("CONNECTOR_SHARD_INDEX", 0)),
+                int(os.environ.get("CONNECTOR_SHARD_COUNT", 1)),
+            )
+        except ValueError as ex:
+            msg = f"Error ({ex}) when grabbing CONNECTOR_SHARD_INDEX or CONNECTOR_SHARD_COUNT environment variables. They SHOULD be integers."
+            self.helper.log_error(msg)
+            raise ValueError(msg) from ex
+        if self.shard.count > 1:
+            self.helper.log_info(f"Importing shard {self.shard.index} of {self.shard.count} of the incidents")
+
+    def _progress(self) -> dict:
+        return self.position
+
+    def _run_state(self) -> dict:
+        # Only written once the run succeeded, a failed run leaves the index and incident hashes of the previous one
+        if self.aggregates is not None:
+            self.aggregates.save()
+        state = {"sources": self.source_state}
+        if self.delta is not None:
+            self.delta.save()
+            state["delta"] = self.delta.state()
+        return state
+
+    def _watch_paths(self) -> list:
+        return [source.path for source in self.sources.enabled()]
+
+    @staticmethod
+    def _positions(sources, skipped):
+        """Yields the (source name, incident, sources done before) of the groups generated from the sources
+
+        The incidents `skipped` (source name -> number of first incidents, None for all of them) are
+        left out, as by `_skip_rows()`. Read lazily: the incidents of a streamed source are counted as
+        its chunks are read, which is always before their groups come out of the scheduler.
+        """
+        done = ()
+        for source in sources:
+            skip = skipped.get(source.name, 0)
+            incident = skip or 0
+            while skip is not None and incident < source.stats["incidents"]:
+                yield source.name, incident, done
+                incident += 1
+            done += (source.name,)
+
+    @staticmethod
+    def _skip_rows(chunks, skip):
+        """Yields the chunks of incident rows without their `skip` first rows (all of them for None)"""
+        for rows in chunks:
+            if skip is None:
+                rows = rows[:0]
+            elif skip:
+                skipped = min(skip, len(rows))
+                rows = rows[skipped:]
+                skip -= skipped
+            yield rows
+
+    @staticmethod
+    def _skipped_incidents(resume, name):
+        """Number of first incidents of a source already in confirmed bundles (None for all of them)"""
+        if not resume:
+            return 0
+        if name in resume.get("done", ()):
+            return None
+        if resume.get("source") == name:
+            return resume["incident"]
+        return 0
+
+    def _inputs(self, resolver) -> str:
+        """Fingerprint of what the groups of a run depend on: the datasets, the DISARM techniques and the shard"""
+        sources = []
+        for source in self.sources.enabled():
+            try:
+                stat = os.stat(source.path)
+                file = [stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                file = None
+            sources.append([source.name, source.format, source.path, source.mapping, file])
+        return content_hash([
+            sources, resolver.ids, self.shard.index, self.shard.count, self.delta_mode, self.stix_validation
+        ])
+
+    def _collect_intelligence(self):
         """Collects intelligence from channels
 
         Add your code depending on the use case as stated at https://docs.opencti.io/latest/development/connectors/.
         Some sample code is provided as a guide to add a specific observable and a reference to the main object.
         Consider adding additional methods to the class to make the code more readable.
 
-        Returns:
-            stix_objects: A list of STIX2 objects."""
+        Yields:
+            stix_objects: Lists of STIX2 objects (one per incident) to be sent in the same bundle."""
         self.helper.log_debug(
             f"{self.helper.connect_name} connector is starting the collection of objects..."
         )
-        stix_objects = []
+        object_count = 0
 
         # ===========================
         # === Add your code below ===
         # ===========================
 
         # Get the STIX techniques introduced by the DISARM connector
-        disarm = self.helper.api.attack_pattern.list()
+        with self.metrics.stage("fetch_attack_patterns"):
+            resolver = TechniqueResolver(self.disarm_cache.load(self.helper))
         # Custom namespace UUID for generating STIX IDs 
         # (now incidents with the same disarm_id will have the same STIX ID)
+        # The graph is shared by all the datasets, so entities and relationships are only built once per run
+        # (with the timestamp of the interrupted run when resuming it, so that the bundles are the same)
+        self.graph = StixGraphBuilder(self.NAMESPACE_UUID, self.stix_validation, self.checkpoint.timestamp)
+
+        # In delta mode, compare the datasets with the hashes of the last successful run
+        current_state = self.helper.get_state() or {}
+        self.delta = None
+        if self.delta_mode:
+            self.delta = DeltaTracker(
+                current_state.get("delta"), content_hash(resolver.ids), os.path.join(self.cache_dir, "delta_incidents.json")
+            )
 
+        # When resuming a run on the same inputs, the incidents before the position of its checkpoint
+        # are all in confirmed bundles: they are still loaded (for the delta and aggregate states)
+        # but not generated again
+        inputs = self._inputs(resolver)
+        resume = None
+        if self.checkpoint.resume_from:
+            if self.checkpoint.inputs == inputs:
+                resume = self.checkpoint.resume_from
+            else:
+                self.helper.log_info("The inputs changed since the interrupted run, generating all the incidents again")
+        self.checkpoint.inputs = inputs
+
+        self.aggregates = None
+        if self.aggregate_index:
+            self.aggregates = AggregateIndex(os.path.join(self.cache_dir, "aggregate_index.json"))
+
+        # Last import of each source, only updated for the sources imported in this run
+        self.source_state = dict(current_state.get("sources", {}))
+        now = int(time.time())
 
         # Save the generated STIX objects
-        #stix_objects.extend(self.generate_disinfo_incidents_stix_objects(disarm))
-        stix_objects.extend(self.generate_margotfulde_incidents_stix_objects(disarm, "datasets/merged_Foulde_DSRM_additions.csv"))
+        jobs = []
+        imported = []
+        streamed = []
+        skipped = {}
+        for source in self.sources.enabled():
+            source.reset_stats()
+            source_state = self.source_state.get(source.name, {})
+            if not source.due(source_state.get("last_run"), now):
+                # Unless the change of its file started the run
+                if os.path.abspath(source.path) not in self.changed_paths:
+                    self.helper.log_info(f"{source.name} is not due yet (imported every {source.run_every}s), skipping it")
+                    continue
+                self.helper.log_info(f"{source.name} is not due yet but its file changed, importing it")
+            full = self.delta is None or source.expired(source_state.get("last_full"), now)
+            if self.delta is not None:
+                if full:
+                    # The TTL of the source expired, import it again in full
+                    self.delta.reset(source.name)
+                if not self.delta.file_changed(source.name, source.path):
+                    self.helper.log_info(f"{source.path} ({source.name}) has not changed since the last run, skipping it")
+                    continue
+            skipped[source.name] = skip = self._skipped_incidents(resume, source.name)
+            if skip != 0:
+                self.helper.log_info(
+                    f"{'All the' if skip is None else f'The first {skip}'} incidents of {source.name} were sent "
+                    "by the interrupted run, they are not generated again"
+                )
+            if self.stream_chunk_rows > 0 and source.streams:
+                # Read while the objects are generated, its load time is added to the stage at the end
+                chunks = self.stream_source(source, self.delta)
+                streamed.append(source)
+            else:
+                with self.metrics.stage("load"):
+                    chunks = [self.load_source(source, self.delta)]
+            jobs.append((source.kind, self._skip_rows(chunks, skip), source.stats))
+            imported.append(source)
+            self.source_state[source.name] = dict(
+                source_state, last_run=now, **({"last_full": now} if full else {})
+            )
+
+        self.helper.log_debug("Creating disinformation STIX objects...")
+        # One group per incident, in source order: follow the position to save it in the checkpoints
+        # (a bundle sent while adding the group of an incident holds the incidents before it)
+        self.position = {}
+        positions = self._positions(imported, skipped)
+        for stix_objects, (source_name, incident, done) in zip(self.scheduler.generate(jobs, resolver, self.graph), positions):
+            self.position = {
+                "source": source_name,
+                "partition": incident // self.scheduler.partition_rows,
+                "incident": incident,
+                "done": list(done),
+            }
+            # The objects of an incident are sent in the same bundle (relationships already sent in this run are left out)
+            object_count += len(stix_objects)
+            yield stix_objects
+        if self.aggregates is not None:
+            with self.metrics.stage("aggregate"):
+                updated = self.aggregates.apply([source.name for source in self.sources.enabled()])
+            self.helper.log_info(
+                f"Aggregate index updated with {updated} added, changed or removed incidents "
+                f"({len(self.aggregates.dirty)} rows changed)"
+            )
+            # Unless the interrupted run already sent them, as all its groups
+            if self.aggregate_notes and not (resume or {}).get("complete"):
+                for stix_objects in self.aggregates.notes(self.graph):
+                    object_count += len(stix_objects)
+                    yield self.graph.group(stix_objects)
+        self.position = {"complete": True, "done": [source.name for source in imported]}
+        resolver.log_summary(self.helper)
+        self.graph.normalizer.log_summary(self.helper)
+        for source in streamed:
+            self.metrics.add_stage("load", source.stats["load_seconds"])
+        for source in imported:
+            self.metrics.add_stage("generate", source.stats["generate_seconds"])
+            self.metrics.add_source(source.name, source.stats)
+            self.helper.log_info(
+                f"{source.name}: {source.stats['incidents']} incidents loaded in {source.stats['load_seconds']:.3f}s, "
+                f"{source.stats['objects']} STIX objects generated in {source.stats['generate_seconds']:.3f}s"
+            )
+        self.helper.log_info(
+            f"{self.graph.node_count} unique entities and {self.graph.edge_count} unique relationships in the graph"
+        )
 
         # ===========================
         # === Add your code above ===
         # ===========================
 
         self.helper.log_info(
-            f"{len(stix_objects)} STIX2 objects have been compiled by {self.helper.connect_name} connector. "
+            f"{object_count} STIX2 objects have been compiled by {self.helper.connect_name} connector. "
         )
-        return stix_objects
 
 
 
-if __name__ == "__main__":
+def main():
     try:
         connector = CustomConnector()
         connector.run()
@@ -327,3 +398,7 @@ if __name__ == "__main__":
         print(e)
         time.sleep(10000000)
         sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Entry point of the connector (see `entrypoint.sh`)
+
+A connector that runs and terminates (`CONNECTOR_RUN_AND_TERMINATE=true`) is started over and over,
+by a scheduler or by its container restart policy, most of the time with nothing to do. Before the
+OpenCTI helper and the STIX and dataframe stacks are imported, the run marker saved by the previous
+runs (see `lib/run_marker.py`) tells whether a run is due; when it is not, the process ends right
+away. Otherwise, and always when the connector keeps running, this is the same as `python main.py`.
+"""
+import os
+import sys
+
+from lib.config import parse_interval
+from lib.run_marker import RunMarker
+
+
+def run_is_due() -> bool:
+    if os.environ.get("CONNECTOR_RUN_AND_TERMINATE", "false").lower() != "true":
+        return True
+    if os.environ.get("CONNECTOR_STARTUP_CHECK", "true").lower() != "true":
+        return True
+    try:
+        interval = parse_interval(os.environ.get("CONNECTOR_RUN_EVERY"))
+    except ValueError:
+        # Reported by the connector
+        return True
+    marker = RunMarker(os.path.join(os.environ.get("CONNECTOR_CACHE_DIR", "cache"), "run_marker.json"))
+    return marker.due(interval, os.environ.get("CONNECTOR_TRIGGER", "interval").lower() != "interval")
+
+
+if __name__ == "__main__":
+    if not run_is_due():
+        print("No run due and no dataset changed since the last run, exiting")
+        sys.exit(0)
+
+    import main
+
+    main.main()